@@ -0,0 +1,83 @@
+"""
+Асинхронные варианты представлений для чтения данных под ASGI.
+
+Django 3.2 не умеет выполнять запросы ORM асинхронно, а синхронные
+представления под ASGI выполняются по очереди в одном потоке процесса.
+Поэтому безопасные запросы (GET, HEAD, OPTIONS) к спискам и карточкам
+рецептов, тегам, ингредиентам и подпискам выполняются через
+'sync_to_async(thread_sensitive=False)' в пуле потоков: медленный запрос
+к Postgres больше не блокирует воркер, а event loop продолжает принимать
+соединения. Остальные методы обрабатываются как обычные синхронные
+представления.
+
+Представления переиспользуют ViewSet'ы из 'api.views' целиком: права,
+фильтры, пагинация и сериализаторы остаются одинаковыми для WSGI и ASGI.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _rendered(view):
+    """Возвращает представление, которое сразу рендерит ответ DRF."""
+
+    @wraps(view)
+    def rendered_view(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    return rendered_view
+
+
+def _with_fresh_connections(view):
+    """
+    Закрывает устаревшие соединения с БД до и после выполнения.
+
+    Потоки пула не получают сигналов request_started/request_finished,
+    поэтому соединения в них обслуживаются вручную с учётом CONN_MAX_AGE.
+    """
+
+    @wraps(view)
+    def thread_view(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return thread_view
+
+
+def async_read_view(viewset_class, actions, detail=False):
+    """
+    Создаёт асинхронный вариант представления ViewSet'а.
+
+    Аргументы:
+    - viewset_class: класс ViewSet'а
+    - actions: соответствие HTTP-методов действиям, как у 'as_view'
+    - detail: представление для отдельного объекта
+
+    Возвращает:
+    Корутину-представление для использования в URLconf.
+    """
+    initkwargs = {'basename': viewset_class.queryset.model._meta.model_name,
+                  'detail': detail}
+    for action in set(actions.values()):
+        method = getattr(viewset_class, action)
+        initkwargs.update(getattr(method, 'kwargs', {}))
+    view = _rendered(viewset_class.as_view(actions, **initkwargs))
+    read = sync_to_async(_with_fresh_connections(view),
+                         thread_sensitive=False)
+    write = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
@@ -0,0 +1,117 @@
+"""
+Аутентификация по токену с кэшированием пользователя.
+
+TokenAuthentication из DRF выполняет запрос к authtoken_token с
+select_related('user') на каждый запрос. CachedTokenAuthentication хранит
+снимок пользователя по ключу токена в локальном LRU-кэше процесса
+с коротким временем жизни и в общем кэше Django. Снимки сбрасываются
+при удалении токена (token/logout) и при сохранении пользователя
+(api.signals). Локальные кэши других воркеров устаревают не позже
+AUTH_TOKEN_LOCAL_CACHE_TTL секунд.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+# Пароль в снимок не попадает: поле остаётся отложенным и при сохранении
+# пользователя не перезаписывается.
+SNAPSHOT_EXCLUDE = ('password',)
+
+
+class LocalLRUCache:
+    """Потокобезопасный LRU-кэш процесса с ограничением времени жизни."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+local_cache = LocalLRUCache(settings.AUTH_TOKEN_LOCAL_CACHE_SIZE,
+                            settings.AUTH_TOKEN_LOCAL_CACHE_TTL)
+
+
+def get_cache_key(token_key):
+    digest = hashlib.sha256(token_key.encode()).hexdigest()
+    return f'auth-token:{digest}'
+
+
+def make_snapshot(user):
+    """Словарь значений полей пользователя без пароля."""
+    return {
+        field.attname: getattr(user, field.attname)
+        for field in User._meta.concrete_fields
+        if field.attname not in SNAPSHOT_EXCLUDE
+    }
+
+
+def restore_user(snapshot):
+    """Восстанавливает пользователя из снимка без запроса к БД."""
+    return User.from_db('default', list(snapshot), list(snapshot.values()))
+
+
+def invalidate_tokens(*token_keys):
+    """Сбрасывает снимки пользователей для перечисленных токенов."""
+    cache_keys = [get_cache_key(key) for key in token_keys]
+    for cache_key in cache_keys:
+        local_cache.delete(cache_key)
+    cache.delete_many(cache_keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшем: токен -> снимок пользователя.
+
+    При попадании в кэш аутентификация не обращается к БД.
+    request.auth - несохранённый объект Token с ключом и пользователем.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_cache_key(key)
+        snapshot = local_cache.get(cache_key)
+        if snapshot is None:
+            snapshot = cache.get(cache_key)
+            if snapshot is not None:
+                local_cache.set(cache_key, snapshot)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            snapshot = make_snapshot(user)
+            cache.set(cache_key, snapshot, settings.AUTH_TOKEN_CACHE_TTL)
+            local_cache.set(cache_key, snapshot)
+            return user, token
+        user = restore_user(snapshot)
+        token = Token(key=key, user=user)
+        return user, token
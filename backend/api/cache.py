@@ -0,0 +1,193 @@
+"""
+Кэширование дорогих вычислений и готовых JSON-ответов.
+
+get_or_build защищает от одновременного пересчёта одного ключа всеми
+воркерами (cache stampede):
+
+- single-flight: пересчитывает только процесс, взявший блокировку через
+  cache.add, остальные ждут результата;
+- вероятностное досрочное обновление (XFetch): незадолго до истечения
+  ключ с некоторой вероятностью пересчитывается заранее, тем чаще, чем
+  дольше он строится;
+- stale-while-revalidate: ещё CACHE_STALE_TTL секунд после истечения
+  старое значение отдаётся, пока один процесс строит новое.
+
+Статистика по группам ключей копится в памяти процесса и доступна
+в /api/instrumentation/.
+
+Ответы cache_response хранятся уже сжатыми отдельно для каждой
+кодировки (br, gzip или без сжатия), поэтому попадание в кэш отдаётся
+без сериализации и повторного сжатия. Кэш списка сбрасывается сменой
+версии при изменении данных (см. api.signals).
+"""
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from api.compression import choose_encoding, compress
+
+LOCK_KEY = 'lock:{}'
+VERSION_KEY = 'response-version:{}'
+RESPONSE_KEY = 'response:{}:{}:{}:{}'
+# Пауза между проверками кэша при ожидании чужого пересчёта
+WAIT_INTERVAL = 0.05
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def _record(name, **values):
+    with _stats_lock:
+        _stats[name].update(values)
+
+
+def get_cache_stats():
+    """Статистика get_or_build процесса по группам ключей."""
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def _build(key, build, timeout, name, locked):
+    start = time.monotonic()
+    try:
+        value = build()
+    finally:
+        if locked:
+            cache.delete(LOCK_KEY.format(key))
+    cost = time.monotonic() - start
+    if value is not None:
+        cache.set(key, (value, time.time() + timeout, cost),
+                  timeout + settings.CACHE_STALE_TTL)
+    _record(name, builds=1, build_seconds=cost)
+    return value
+
+
+def _wait(key):
+    """Ждёт значение, которое строит другой процесс."""
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(LOCK_KEY.format(key)) is None:
+            return None
+    return None
+
+
+def get_or_build(key, build, timeout, name=None):
+    """
+    Возвращает значение из кэша, при необходимости пересчитывая его.
+
+    Args:
+        key: Ключ кэша.
+        build: Функция без аргументов, строящая значение. Результат None
+            не кэшируется.
+        timeout: Время жизни значения в секундах.
+        name: Группа ключей для статистики, по умолчанию префикс ключа
+            до двоеточия.
+    """
+    name = name or key.split(':', 1)[0]
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires, cost = entry
+        now = time.time()
+        # XFetch: -log(U) > 0, чем дороже построение, тем раньше пересчёт.
+        early = cost * settings.CACHE_EARLY_BETA * -math.log(
+            1 - random.random())
+        if now + early < expires:
+            _record(name, hits=1)
+            return value
+        if not cache.add(LOCK_KEY.format(key), 1,
+                         settings.CACHE_LOCK_TIMEOUT):
+            # Пересчёт уже идёт в другом процессе.
+            _record(name, **{'hits' if now < expires else 'stale': 1})
+            return value
+        _record(name, **{'early' if now < expires else 'refreshes': 1})
+        return _build(key, build, timeout, name, locked=True)
+    _record(name, misses=1)
+    if cache.add(LOCK_KEY.format(key), 1, settings.CACHE_LOCK_TIMEOUT):
+        return _build(key, build, timeout, name, locked=True)
+    _record(name, waits=1)
+    entry = _wait(key)
+    if entry is not None:
+        return entry[0]
+    # Пересчёт в другом процессе не успел или упал.
+    return _build(key, build, timeout, name, locked=False)
+
+
+def _version(name):
+    return cache.get_or_set(VERSION_KEY.format(name), 1, None)
+
+
+def invalidate_responses(name):
+    """Сбрасывает кэш ответов группы name."""
+    try:
+        cache.incr(VERSION_KEY.format(name))
+    except ValueError:
+        cache.set(VERSION_KEY.format(name), 1, None)
+
+
+def cache_response(name):
+    """
+    Кэширует успешные JSON-ответы метода ViewSet'а.
+
+    Ключ включает путь с параметрами запроса, поэтому ответ не должен
+    зависеть от пользователя.
+
+    Args:
+        name: Группа ответов для сброса через invalidate_responses.
+    """
+    def decorator(method):
+        @wraps(method)
+        def cached_method(self, request, *args, **kwargs):
+            if request.accepted_renderer.format != 'json':
+                return method(self, request, *args, **kwargs)
+            encoding = choose_encoding(request)
+            uncached = None
+
+            def build():
+                nonlocal uncached
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    uncached = response
+                    return None
+                body = request.accepted_renderer.render(
+                    response.data, request.accepted_media_type,
+                    self.get_renderer_context(),
+                )
+                if (encoding is None
+                        or len(body) < settings.COMPRESSION_MIN_SIZE):
+                    return None, body
+                return encoding, compress(body, encoding)
+
+            path = hashlib.sha256(
+                request.get_full_path().encode()).hexdigest()
+            entry = get_or_build(
+                RESPONSE_KEY.format(name, _version(name), path,
+                                    encoding or 'identity'),
+                build, settings.RESPONSE_CACHE_TTL, name=f'response:{name}',
+            )
+            if entry is None:
+                return uncached
+            entry_encoding, body = entry
+            response = HttpResponse(
+                body, content_type=request.accepted_media_type
+            )
+            if entry_encoding:
+                response['Content-Encoding'] = entry_encoding
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+
+        return cached_method
+
+    return decorator
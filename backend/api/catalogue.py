@@ -0,0 +1,263 @@
+"""
+Статический снимок публичного каталога рецептов для раздачи nginx/CDN.
+
+Снимок пишется в CATALOGUE_ROOT (том static, который раздаёт nginx по
+CATALOGUE_URL) в формате ответов API для анонимного пользователя:
+
+- tags.json, ingredients.json - списки тегов и ингредиентов;
+- recipes/<id>.json - карточки рецептов;
+- lists/<теги>/<страница>.json - страницы списка рецептов без фильтра
+  (all) и для сочетаний до CATALOGUE_MAX_TAGS тегов (slug через '+'
+  в алфавитном порядке), next/previous ведут на соседние файлы;
+- manifest.json - время сборки, размер страницы, число рецептов
+  и страниц каждого списка и хэши содержимого всех файлов.
+
+Каждый файл лежит рядом со сжатым .gz для gzip_static. Сжатый .br
+пишется только при CATALOGUE_BROTLI (нужен модуль brotli в Python и
+ngx_brotli с brotli_static on в nginx), иначе его никто не отдаст.
+Ссылки на картинки абсолютные, если задан CATALOGUE_SITE_URL, иначе
+остаются путями от корня сайта (/media/...), как в документе рецепта:
+каталог раздаётся с того же хоста, что и медиафайлы.
+Пересборка инкрементальная: карточки собираются только для рецептов,
+документ которых (RecipeDocument) пересобран после прошлой сборки (его
+поле updated не совпадает с записанным в манифесте), страница списка -
+только если изменились её рецепты или их число, а файл перезаписывается, только
+если изменилось содержимое. Файлы удалённых рецептов и страниц
+удаляются.
+"""
+import gzip
+import hashlib
+import json
+import os
+from itertools import combinations
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from api.compression import brotli
+from api.documents import build_documents
+from api.serializers import (USER_FLAGS, IngredientSerializer,
+                             RecipeReadSerializer, TagsSerializer)
+from recipes.models import Ingredient, Recipe, RecipeDocument, Tag
+
+MANIFEST = 'manifest.json'
+ALL_RECIPES = 'all'
+RECIPE_PATH = 'recipes/{}.json'
+PAGE_PATH = 'lists/{}/{}.json'
+BATCH_SIZE = 500
+
+
+def public_recipe(document):
+    """Рецепт из документа в виде ответа API анонимному пользователю."""
+    data = {}
+    for name in RecipeReadSerializer.Meta.fields:
+        if name in USER_FLAGS:
+            data[name] = False
+        elif name == 'author':
+            data[name] = dict(document[name], is_subscribed=False)
+        elif name == 'image' and document[name]:
+            data[name] = urljoin(settings.CATALOGUE_SITE_URL, document[name])
+        else:
+            data[name] = document[name]
+    return data
+
+
+def _digest(value):
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True).encode()
+    ).hexdigest()
+
+
+class CatalogueWriter:
+    """
+    Пишет файлы каталога атомарно вместе со сжатыми вариантами.
+
+    Файлы, содержимое которых совпадает с прошлой сборкой, не
+    перезаписываются.
+    """
+
+    def __init__(self, root, previous):
+        self.root = root
+        self.previous = previous.get('files', {})
+        self.previous_sources = previous.get('sources', {})
+        self.files = {}
+        self.sources = {}
+        self.written = 0
+
+    def is_fresh(self, path, source):
+        """Проверяет, что файл собран из тех же данных и лежит на месте."""
+        return (self.previous_sources.get(path) == source
+                and os.path.exists(os.path.join(self.root, path)))
+
+    def keep(self, path, source=None):
+        """Оставляет файл прошлой сборки без изменений."""
+        self.files[path] = self.previous[path]
+        if source is not None:
+            self.sources[path] = source
+
+    def write(self, path, data, source=None):
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':'),
+                          cls=DjangoJSONEncoder).encode()
+        digest = hashlib.sha256(body).hexdigest()
+        self.files[path] = digest
+        if source is not None:
+            self.sources[path] = source
+        if (self.previous.get(path) == digest
+                and os.path.exists(os.path.join(self.root, path))):
+            return
+        self._write_variants(path, body)
+        self.written += 1
+
+    def _write_variants(self, path, body):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        variants = {'': body, '.gz': gzip.compress(body, 9, mtime=0)}
+        if settings.CATALOGUE_BROTLI and brotli is not None:
+            variants['.br'] = brotli.compress(body, quality=11)
+        elif os.path.exists(full_path + '.br'):
+            # Не оставляем устаревший .br после отключения brotli.
+            os.remove(full_path + '.br')
+        for suffix, content in variants.items():
+            temp_path = f'{full_path}{suffix}.tmp'
+            with open(temp_path, 'wb') as file:
+                file.write(content)
+            os.replace(temp_path, full_path + suffix)
+
+    def remove_stale(self):
+        """Удаляет файлы прошлой сборки, которых нет в текущей."""
+        removed = 0
+        for path in set(self.previous) - set(self.files):
+            full_path = os.path.join(self.root, path)
+            for suffix in ('', '.gz', '.br'):
+                try:
+                    os.remove(full_path + suffix)
+                except FileNotFoundError:
+                    pass
+            try:
+                # Каталог списка сочетания тегов, которого больше нет.
+                os.rmdir(os.path.dirname(full_path))
+            except OSError:
+                pass
+            removed += 1
+        return removed
+
+    def write_manifest(self, manifest):
+        manifest.update(files=self.files, sources=self.sources)
+        body = json.dumps(manifest, ensure_ascii=False,
+                          separators=(',', ':')).encode()
+        self._write_variants(MANIFEST, body)
+
+
+def load_manifest(root):
+    """Манифест прошлой сборки или пустой словарь."""
+    try:
+        with open(os.path.join(root, MANIFEST), 'rb') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _export_recipes(writer):
+    """
+    Пишет карточки рецептов, документы которых изменились.
+
+    Время updated документа сравнивается на равенство с записанным при
+    прошлой сборке, а не со временем сборки: документ, сохранённый до
+    неё, но зафиксированный позже, всё равно будет пересобран.
+    """
+    changed = []
+    for pk, updated in RecipeDocument.objects.values_list(
+        'recipe_id', 'updated'
+    ).iterator():
+        path = RECIPE_PATH.format(pk)
+        if writer.is_fresh(path, updated.isoformat()):
+            writer.keep(path, updated.isoformat())
+        else:
+            changed.append(pk)
+    for start in range(0, len(changed), BATCH_SIZE):
+        for pk, document, updated in RecipeDocument.objects.filter(
+            recipe__in=changed[start:start + BATCH_SIZE]
+        ).values_list('recipe_id', 'data', 'updated'):
+            writer.write(RECIPE_PATH.format(pk), public_recipe(document),
+                         updated.isoformat())
+    return len(changed)
+
+
+def _page_url(name, page):
+    return settings.CATALOGUE_URL + PAGE_PATH.format(name, page)
+
+
+def _export_list(writer, name, queryset, page_size):
+    """Пишет страницы одного списка рецептов."""
+    pks = list(queryset.order_by('-date', '-pk').values_list('pk', flat=True)
+               .distinct())
+    pages = max((len(pks) + page_size - 1) // page_size, 1)
+    for page in range(1, pages + 1):
+        page_pks = pks[(page - 1) * page_size:page * page_size]
+        path = PAGE_PATH.format(name, page)
+        # Страница зависит от числа рецептов, своих рецептов и их карточек.
+        source = _digest([len(pks), pages, [
+            (pk, writer.files.get(RECIPE_PATH.format(pk))) for pk in page_pks
+        ]])
+        if writer.is_fresh(path, source):
+            writer.keep(path, source)
+            continue
+        documents = dict(RecipeDocument.objects.filter(
+            recipe__in=page_pks).values_list('recipe_id', 'data'))
+        writer.write(path, {
+            'count': len(pks),
+            'next': _page_url(name, page + 1) if page < pages else None,
+            'previous': _page_url(name, page - 1) if page > 1 else None,
+            'results': [public_recipe(documents[pk]) for pk in page_pks
+                        if pk in documents],
+        }, source)
+    return {'count': len(pks), 'pages': pages}
+
+
+def export_catalogue(root=None, max_tags=None, full=False):
+    """
+    Собирает снимок каталога в root.
+
+    Args:
+        root: Каталог снимка, по умолчанию CATALOGUE_ROOT.
+        max_tags: Наибольшее число тегов в сочетании для списков,
+            по умолчанию CATALOGUE_MAX_TAGS.
+        full: Пересобрать все карточки, не глядя на прошлую сборку.
+
+    Returns:
+        dict: Число пересобранных карточек, записанных и удалённых файлов.
+    """
+    root = root or settings.CATALOGUE_ROOT
+    max_tags = settings.CATALOGUE_MAX_TAGS if max_tags is None else max_tags
+    previous = {} if full else load_manifest(root)
+    # Документы собираются фоновыми задачами, недостающие - здесь.
+    build_documents(Recipe.objects.filter(document__isnull=True))
+    generated = timezone.now()
+    writer = CatalogueWriter(root, previous)
+    recipes = _export_recipes(writer)
+    writer.write('tags.json',
+                 TagsSerializer(Tag.objects.all(), many=True).data)
+    writer.write('ingredients.json', IngredientSerializer(
+        Ingredient.objects.all(), many=True).data)
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    lists = {ALL_RECIPES: _export_list(writer, ALL_RECIPES,
+                                       Recipe.objects.all(), page_size)}
+    slugs = sorted(Tag.objects.values_list('slug', flat=True))
+    for size in range(1, min(max_tags, len(slugs)) + 1):
+        for combination in combinations(slugs, size):
+            name = '+'.join(combination)
+            lists[name] = _export_list(
+                writer, name,
+                Recipe.objects.filter(tags__slug__in=combination), page_size
+            )
+    removed = writer.remove_stale()
+    writer.write_manifest({
+        'generated': generated.isoformat(),
+        'page_size': page_size,
+        'max_tags': max_tags,
+        'lists': lists,
+    })
+    return {'recipes': recipes, 'written': writer.written,
+            'removed': removed}
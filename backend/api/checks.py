@@ -0,0 +1,33 @@
+"""
+Системные проверки настроек API.
+
+Сброс закэшированных ответов (api.cache), метки чтения с основной базы
+(foodgram.db_router), лимиты частоты, журналы индексов и событий и
+билеты потока событий хранятся в кэше default. Они работают, только
+если кэш общий для всех процессов: воркеров веб-сервера, воркера
+фоновых задач и команд управления. LocMemCache живёт в памяти одного
+процесса, поэтому без DEBUG о нём выдаётся предупреждение.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'Кэш default хранится в памяти процесса.',
+        hint=(
+            'Сброс кэша ответов, чтение с основной базы после записи и '
+            'лимиты частоты не действуют между процессами. Задайте общий '
+            'кэш через CACHE_BACKEND и CACHE_LOCATION (Redis, memcached).'
+        ),
+        obj=backend,
+        id='api.W001',
+    )]
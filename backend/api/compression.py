@@ -0,0 +1,82 @@
+"""
+Сжатие ответов: выбор кодировки по Accept-Encoding, сжатие целого тела
+и потока. Brotli используется, если установлен пакет brotli, иначе gzip.
+"""
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Порядок - предпочтение сервера среди принятых клиентом кодировок.
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/xml')
+# Поток событий нельзя буферизовать в компрессоре.
+INCOMPRESSIBLE_TYPES = ('text/event-stream',)
+
+
+def choose_encoding(request):
+    """
+    Выбирает кодировку ответа по заголовку Accept-Encoding.
+
+    Returns:
+        str: 'br', 'gzip' или None, если клиент не принимает сжатие.
+    """
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if name.strip():
+            accepted[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type):
+    """Проверяет, имеет ли смысл сжимать ответ с таким Content-Type."""
+    content_type = content_type.lower()
+    return (content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(INCOMPRESSIBLE_TYPES))
+
+
+def _compressor(encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL,
+                                  zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def compress(data, encoding):
+    """Сжимает байты целиком."""
+    process, finish = _compressor(encoding)
+    return process(data) + finish()
+
+
+def compress_stream(chunks, encoding):
+    """Сжимает поток частей ответа, не собирая его в памяти."""
+    process, finish = _compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
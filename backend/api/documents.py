@@ -0,0 +1,72 @@
+"""
+Готовые JSON-документы рецептов (RecipeDocument).
+
+Документ - публичное представление рецепта (RecipePublicSerializer)
+с тегами, ингредиентами и автором. Список и карточка рецептов отдают
+его без запросов связанных таблиц, подставляя флаги текущего
+пользователя (RecipeDocumentSerializer).
+
+Документ созданного или изменённого рецепта (API и админка)
+пересобирается в процессе запроса сразу после фиксации транзакции
+(build_documents_on_commit), поэтому автор сразу читает свои правки.
+Изменение тега, ингредиента или профиля автора затрагивает много
+рецептов, их документы пересобирает фоновая задача
+(refresh_recipe_documents, api.signals). Заполнить документы для
+существующих рецептов: manage.py build_recipe_documents.
+"""
+from django.db import transaction
+
+from api.serializers import RecipePublicSerializer
+from jobs.queue import task
+from recipes.models import Recipe, RecipeDocument
+
+BATCH_SIZE = 500
+
+
+def build_documents(queryset, batch_size=BATCH_SIZE):
+    """
+    Собирает документы рецептов queryset пачками.
+
+    Returns:
+        int: Число собранных документов.
+    """
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True)
+               .distinct())
+    for start in range(0, len(pks), batch_size):
+        chunk = pks[start:start + batch_size]
+        recipes = (
+            Recipe.objects.filter(pk__in=chunk)
+            .select_related('author')
+            .prefetch_related('tags', 'recipeingredients__ingredient')
+        )
+        documents = [
+            RecipeDocument(recipe=recipe,
+                           data=RecipePublicSerializer(recipe).data)
+            for recipe in recipes
+        ]
+        with transaction.atomic():
+            RecipeDocument.objects.filter(recipe__in=chunk).delete()
+            # Параллельная сборка могла вставить документ после DELETE,
+            # он собран из тех же зафиксированных данных.
+            RecipeDocument.objects.bulk_create(documents,
+                                               ignore_conflicts=True)
+    return len(pks)
+
+
+def build_documents_on_commit(pks):
+    """Пересобирает документы рецептов pks после фиксации транзакции."""
+    transaction.on_commit(
+        lambda: build_documents(Recipe.objects.filter(pk__in=pks))
+    )
+
+
+@task
+def refresh_recipe_documents(**lookup):
+    """
+    Пересобирает документы рецептов (фоновая задача).
+
+    Args:
+        lookup: Условия отбора рецептов для Recipe.objects.filter,
+            например pk__in=[...], author=id или tags=id.
+    """
+    build_documents(Recipe.objects.filter(**lookup))
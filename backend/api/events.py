@@ -0,0 +1,191 @@
+"""
+Рассылка событий о новых рецептах подписчикам автора.
+
+После фиксации создания рецепта событие (автор и краткий рецепт)
+публикуется через бэкенд EVENTS_BACKEND. Хаб процесса держит подписки
+открытых соединений (api.sse) по авторам и раздаёт им события.
+
+Бэкенды:
+- CacheBackend - журнал событий в общем кэше, хаб каждого процесса
+  опрашивает его раз в EVENTS_POLL_INTERVAL секунд, поэтому события
+  доходят до всех воркеров, в том числе опубликованные под WSGI;
+- LocalBackend - доставка внутри процесса, для одного воркера ASGI.
+Другой бэкенд (например, Redis pub/sub) реализует publish и read.
+
+У каждой подписки очередь не длиннее EVENTS_QUEUE_SIZE: если клиент
+не успевает читать, подписка помечается переполненной и соединение
+закрывается, клиент переподключается и дочитывает пропущенное через
+REST API.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+EVENTS_GENERATION_KEY = 'recipe-events:generation'
+EVENTS_ENTRY_KEY = 'recipe-events:{}'
+# Сколько секунд ждать запись журнала, номер которой уже выдан
+MISSING_ENTRY_GRACE = 5
+
+
+class CacheBackend:
+    """Журнал событий в общем кэше для доставки между процессами."""
+
+    polling = True
+
+    def __init__(self):
+        self.missing = None
+
+    def publish(self, event):
+        cache.add(EVENTS_GENERATION_KEY, 0, None)
+        try:
+            generation = cache.incr(EVENTS_GENERATION_KEY)
+        except ValueError:
+            # Счётчик вытеснен между add и incr, событие теряется.
+            cache.set(EVENTS_GENERATION_KEY, 0, None)
+            return
+        cache.set(EVENTS_ENTRY_KEY.format(generation), event,
+                  settings.EVENTS_LOG_TTL)
+
+    def read(self, since):
+        """
+        Возвращает события после заданного поколения журнала.
+
+        Номер события выдаётся до записи самого события, поэтому
+        отсутствующая запись может ещё появиться: чтение на ней
+        останавливается и продолжается с неё в следующий раз. Запись,
+        которой нет дольше MISSING_ENTRY_GRACE секунд, считается
+        потерянной (вытеснена или публикация прервалась).
+
+        Returns:
+            tuple: Поколение, до которого события прочитаны, и список
+                событий. Для since=None (первое чтение) событий нет.
+        """
+        generation = cache.get(EVENTS_GENERATION_KEY, 0)
+        if since is None or generation <= since:
+            return generation, []
+        first = max(since + 1, generation - settings.EVENTS_LOG_SIZE + 1)
+        keys = [EVENTS_ENTRY_KEY.format(number)
+                for number in range(first, generation + 1)]
+        entries = cache.get_many(keys)
+        events = []
+        for number, key in enumerate(keys, first):
+            if key in entries:
+                events.append(entries[key])
+            elif self._is_pending(number):
+                return number - 1, events
+        return generation, events
+
+    def _is_pending(self, number):
+        """Проверяет, стоит ли ещё ждать отсутствующую запись."""
+        now = time.monotonic()
+        if self.missing is None or self.missing[0] != number:
+            self.missing = (number, now + MISSING_ENTRY_GRACE)
+        return now < self.missing[1]
+
+
+class LocalBackend:
+    """Доставка событий внутри процесса."""
+
+    polling = False
+
+    def publish(self, event):
+        hub.dispatch_threadsafe(event)
+
+    def read(self, since):
+        return since, []
+
+
+class Subscription:
+    """Подписка соединения на события авторов."""
+
+    def __init__(self, authors):
+        self.authors = set(authors)
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def offer(self, event):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= settings.EVENTS_QUEUE_SIZE:
+            # None будит соединение, чтобы оно закрылось.
+            self.overflowed = True
+            event = None
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    """Подписки соединений процесса по авторам."""
+
+    def __init__(self):
+        self.backend = import_string(settings.EVENTS_BACKEND)()
+        self.subscribers = defaultdict(set)
+        self.loop = None
+        self.poller = None
+        self.generation = None
+
+    def subscribe(self, authors):
+        """Подписывает соединение на авторов, вызывается из event loop."""
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(authors)
+        for author in subscription.authors:
+            self.subscribers[author].add(subscription)
+        if self.backend.polling and (self.poller is None
+                                     or self.poller.done()):
+            self.poller = self.loop.create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for author in subscription.authors:
+            subscriptions = self.subscribers.get(author)
+            if subscriptions is None:
+                continue
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscribers[author]
+
+    def dispatch(self, event):
+        for subscription in list(self.subscribers.get(event['author'], ())):
+            subscription.offer(event)
+
+    def dispatch_threadsafe(self, event):
+        """Передаёт событие в event loop хаба из другого потока."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, event)
+
+    async def _poll(self):
+        read = sync_to_async(self.backend.read, thread_sensitive=False)
+        self.generation = None
+        # Пока есть подписчики хоть на одного автора.
+        while self.subscribers:
+            try:
+                self.generation, events = await read(self.generation)
+            except Exception:
+                logger.exception('Не удалось прочитать журнал событий')
+                events = []
+            for event in events:
+                self.dispatch(event)
+            await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+
+
+hub = EventHub()
+
+
+def publish_recipe_created(author_id, recipe):
+    """
+    Рассылает подписчикам автора новый рецепт после фиксации транзакции.
+
+    Args:
+        author_id: Идентификатор автора.
+        recipe: Данные RecipeShortSerializer.
+    """
+    event = {'author': author_id, 'recipe': dict(recipe)}
+    transaction.on_commit(lambda: hub.backend.publish(event))
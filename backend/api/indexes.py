@@ -0,0 +1,541 @@
+"""
+Индексы рецептов в памяти процесса.
+
+Индекс строится одним запросом при первом обращении и дальше обновляется
+по журналу изменений рецептов в общем кэше: каждый воркер при запросе
+сверяет номер поколения журнала и перечитывает из БД только изменённые
+рецепты. Если журнал устарел (записи вытеснены из кэша) или индекс
+старше RECIPE_INDEX_MAX_AGE, он перестраивается целиком в фоновом
+потоке, а запросы до замены читают прежний индекс.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from scipy import sparse
+
+from jobs.queue import task
+from recipes.models import Recipe, RecipeIngredients
+
+logger = logging.getLogger(__name__)
+
+CHANGELOG_GENERATION_KEY = 'recipe-changes:generation'
+CHANGELOG_ENTRY_KEY = 'recipe-changes:{}'
+SIMILAR_RECIPES_KEY = 'similar-recipes:{}'
+
+
+def notify_recipe_changed(recipe_id):
+    """
+    Записывает изменение рецепта в журнал после фиксации транзакции.
+
+    Args:
+        recipe_id: Идентификатор созданного, изменённого или удалённого
+            рецепта.
+    """
+    transaction.on_commit(lambda: _append_change(recipe_id))
+    refresh_similar_recipes.delay(recipe_id)
+
+
+def _append_change(recipe_id):
+    cache.add(CHANGELOG_GENERATION_KEY, 0, None)
+    try:
+        generation = cache.incr(CHANGELOG_GENERATION_KEY)
+    except ValueError:
+        # Счётчик вытеснен между add и incr: индексы перестроятся целиком.
+        cache.set(CHANGELOG_GENERATION_KEY, 0, None)
+        return
+    cache.set(CHANGELOG_ENTRY_KEY.format(generation), recipe_id,
+              settings.RECIPE_INDEX_CHANGELOG_TTL)
+
+
+def get_changes(since):
+    """
+    Возвращает изменения рецептов после заданного поколения журнала.
+
+    Args:
+        since: Поколение журнала, до которого изменения уже учтены.
+
+    Returns:
+        tuple: Текущее поколение и множество изменённых рецептов или None,
+            если изменения восстановить нельзя и нужна полная перестройка.
+    """
+    generation = cache.get(CHANGELOG_GENERATION_KEY, 0)
+    if since is None or generation < since:
+        return generation, None
+    if generation == since:
+        return generation, set()
+    if generation - since > settings.RECIPE_INDEX_CHANGELOG_SIZE:
+        return generation, None
+    keys = [CHANGELOG_ENTRY_KEY.format(number)
+            for number in range(since + 1, generation + 1)]
+    entries = cache.get_many(keys)
+    if len(entries) != len(keys):
+        return generation, None
+    return generation, set(entries.values())
+
+
+class RecipeIndex:
+    """
+    Базовый класс индекса рецептов, синхронизируемого по журналу изменений.
+
+    Наследники реализуют build (полная перестройка) и apply (обновление
+    переданных рецептов). Индекс дополнительно перестраивается целиком
+    раз в RECIPE_INDEX_MAX_AGE секунд, чтобы учесть изменения в обход
+    журнала (например, удаление ингредиента из админки).
+
+    Только первая сборка выполняется в запросе. Полная перестройка
+    собирает новый экземпляр в фоновом потоке и подменяет им данные
+    индекса под блокировкой; до этого запросы читают прежний индекс.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.generation = None
+        self.built_at = 0
+        self.rebuilding = False
+
+    def refresh(self):
+        """Приводит индекс в соответствие с журналом изменений."""
+        with self.lock:
+            if self.generation is None:
+                self.replace(self.build_fresh())
+                return
+            if (time.monotonic() - self.built_at
+                    > settings.RECIPE_INDEX_MAX_AGE):
+                self.start_rebuild()
+            generation, changed = get_changes(self.generation)
+            if changed is None:
+                # Журнала не хватает: до перестройки индекс отстаёт.
+                self.start_rebuild()
+                return
+            if changed:
+                self.apply(changed)
+            self.generation = generation
+
+    def build_fresh(self):
+        """Собирает новый экземпляр индекса по текущим данным."""
+        index = type(self)()
+        # Поколение берётся до сборки: изменения во время сборки
+        # применятся повторно при следующем refresh.
+        index.generation = cache.get(CHANGELOG_GENERATION_KEY, 0)
+        index.build()
+        index.built_at = time.monotonic()
+        return index
+
+    def replace(self, index):
+        """Подменяет данные индекса данными собранного экземпляра."""
+        with self.lock:
+            for name, value in vars(index).items():
+                if name not in ('lock', 'rebuilding'):
+                    setattr(self, name, value)
+
+    def start_rebuild(self):
+        """Запускает полную перестройку в фоне, если она ещё не идёт."""
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self.replace(self.build_fresh())
+        except Exception:
+            logger.exception('Не удалось перестроить индекс рецептов')
+        finally:
+            self.rebuilding = False
+            # Соединения с БД этого потока.
+            connections.close_all()
+
+    def build(self):
+        raise NotImplementedError
+
+    def apply(self, recipe_ids):
+        raise NotImplementedError
+
+
+class CookableIndex(RecipeIndex):
+    """
+    Инвертированный индекс «ингредиент -> рецепты».
+
+    Рецепты пронумерованы строками; для каждого ингредиента хранится
+    отсортированный массив строк рецептов, в которые он входит, а для
+    каждой строки — число ингредиентов рецепта. Покрытие считается
+    одним np.bincount по спискам строк имеющихся ингредиентов.
+    """
+
+    def build(self):
+        rows = {}
+        recipe_ids = []
+        postings = {}
+        recipe_ingredients = {}
+        pairs = (RecipeIngredients.objects
+                 .order_by('recipe_id')
+                 .values_list('recipe_id', 'ingredient_id')
+                 .iterator())
+        for recipe_id, ingredient_id in pairs:
+            row = rows.get(recipe_id)
+            if row is None:
+                row = rows[recipe_id] = len(recipe_ids)
+                recipe_ids.append(recipe_id)
+                recipe_ingredients[row] = []
+            recipe_ingredients[row].append(ingredient_id)
+            postings.setdefault(ingredient_id, []).append(row)
+        self.rows = rows
+        self.recipe_ids = np.array(recipe_ids, dtype=np.int64)
+        self.sizes = np.array(
+            [len(recipe_ingredients[row]) for row in range(len(recipe_ids))],
+            dtype=np.int32,
+        )
+        self.recipe_ingredients = {
+            row: frozenset(ingredients)
+            for row, ingredients in recipe_ingredients.items()
+        }
+        self.postings = {
+            ingredient_id: np.array(row_list, dtype=np.int32)
+            for ingredient_id, row_list in postings.items()
+        }
+
+    def apply(self, recipe_ids):
+        current = {}
+        pairs = (RecipeIngredients.objects
+                 .filter(recipe_id__in=recipe_ids)
+                 .values_list('recipe_id', 'ingredient_id'))
+        for recipe_id, ingredient_id in pairs:
+            current.setdefault(recipe_id, set()).add(ingredient_id)
+        for recipe_id in recipe_ids:
+            self.update_recipe(recipe_id, current.get(recipe_id, set()))
+
+    def update_recipe(self, recipe_id, ingredients):
+        """
+        Заменяет набор ингредиентов рецепта в индексе.
+
+        Удалённый рецепт (пустой набор) сохраняет строку с нулевым
+        размером, строка переиспользуется при повторном появлении рецепта.
+        """
+        row = self.rows.get(recipe_id)
+        if row is None:
+            if not ingredients:
+                return
+            row = self.rows[recipe_id] = len(self.recipe_ids)
+            self.recipe_ids = np.append(self.recipe_ids, recipe_id)
+            self.sizes = np.append(self.sizes, np.int32(0))
+        old = self.recipe_ingredients.get(row, frozenset())
+        new = frozenset(ingredients)
+        for ingredient_id in old - new:
+            posting = self.postings[ingredient_id]
+            position = np.searchsorted(posting, row)
+            self.postings[ingredient_id] = np.delete(posting, position)
+        for ingredient_id in new - old:
+            posting = self.postings.get(
+                ingredient_id, np.empty(0, dtype=np.int32)
+            )
+            position = np.searchsorted(posting, row)
+            self.postings[ingredient_id] = np.insert(posting, position, row)
+        self.recipe_ingredients[row] = new
+        self.sizes[row] = len(new)
+
+    def search(self, ingredient_ids, limit):
+        """
+        Подбирает рецепты с наибольшим покрытием ингредиентами.
+
+        Args:
+            ingredient_ids: Идентификаторы имеющихся ингредиентов.
+            limit: Число возвращаемых рецептов.
+
+        Returns:
+            list: Кортежи (id рецепта, покрыто ингредиентов, всего
+                ингредиентов) по убыванию доли покрытия, затем по
+                числу покрытых ингредиентов.
+        """
+        self.refresh()
+        with self.lock:
+            postings = [self.postings[ingredient_id]
+                        for ingredient_id in set(ingredient_ids)
+                        if ingredient_id in self.postings]
+            if not postings:
+                return []
+            recipe_ids = self.recipe_ids
+            sizes = self.sizes
+            covered = np.bincount(np.concatenate(postings),
+                                  minlength=len(sizes))
+            candidates = np.flatnonzero(covered)
+            if len(candidates) > limit:
+                coverage = covered[candidates] / sizes[candidates]
+                # Предварительный отбор по доле покрытия, точный порядок ниже.
+                threshold = np.partition(coverage, -limit)[-limit]
+                candidates = candidates[coverage >= threshold]
+            order = np.lexsort((
+                recipe_ids[candidates],
+                -covered[candidates],
+                -covered[candidates] / sizes[candidates],
+            ))[:limit]
+            top = candidates[order]
+            return [
+                (int(recipe_ids[row]), int(covered[row]), int(sizes[row]))
+                for row in top
+            ]
+
+
+cookable_index = CookableIndex()
+
+
+def recipe_features(recipe_ids=None):
+    """
+    Собирает признаки рецептов: ингредиенты и теги.
+
+    Args:
+        recipe_ids: Идентификаторы рецептов, по умолчанию все рецепты.
+
+    Returns:
+        dict: {id рецепта: множество признаков ('ingredient'|'tag', id)}.
+    """
+    ingredients = RecipeIngredients.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    )
+    tags = Recipe.tags.through.objects.values_list('recipe_id', 'tag_id')
+    if recipe_ids is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        tags = tags.filter(recipe_id__in=recipe_ids)
+    features = {}
+    for kind, pairs in (('ingredient', ingredients), ('tag', tags)):
+        for recipe_id, feature_id in pairs.iterator():
+            features.setdefault(recipe_id, set()).add((kind, feature_id))
+    return features
+
+
+def _normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def _top_k(scores, recipe_ids, k):
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[
+            np.argpartition(scores[candidates], -k)[-k:]
+        ]
+    candidates = candidates[np.lexsort((
+        recipe_ids[candidates], -scores[candidates]
+    ))]
+    return [(int(recipe_ids[row]), round(float(scores[row]), 4))
+            for row in candidates]
+
+
+class SimilarIndex(RecipeIndex):
+    """
+    Векторы рецептов для поиска похожих.
+
+    Каждый рецепт — строка CSR-матрицы над ингредиентами и тегами с весами
+    TF-IDF, нормированная по длине, так что косинусная близость считается
+    произведением матриц. Матрицу строит команда build_similar_recipes и
+    сохраняет снимок на диск; воркер загружает снимок и догоняет его по
+    журналу изменений, а если журнала не хватает — строит матрицу из БД.
+    Изменённый рецепт получает новую строку, старая обнуляется до
+    следующей полной перестройки.
+    """
+
+    def build(self):
+        generation = self.load_snapshot(settings.SIMILAR_RECIPES_SNAPSHOT)
+        if generation is not None:
+            _, changed = get_changes(generation)
+            if changed is not None:
+                self.apply(changed)
+                return
+        self.build_from_db()
+
+    def build_from_db(self):
+        """Строит матрицу по всем рецептам."""
+        features = recipe_features()
+        self.rows = {}
+        self.columns = {}
+        indptr = [0]
+        indices = []
+        for row, (recipe_id, recipe) in enumerate(sorted(features.items())):
+            self.rows[recipe_id] = row
+            indices.extend(sorted(
+                self.columns.setdefault(feature, len(self.columns))
+                for feature in recipe
+            ))
+            indptr.append(len(indices))
+        indices = np.array(indices, dtype=np.int32)
+        frequency = np.bincount(indices, minlength=len(self.columns))
+        self.idf = (np.log((1 + len(features)) / (1 + frequency)) + 1
+                    ).astype(np.float32)
+        self.recipe_ids = np.array(sorted(features), dtype=np.int64)
+        self.matrix = _normalize(sparse.csr_matrix(
+            (self.idf[indices], indices, indptr),
+            shape=(len(features), len(self.columns)),
+        ))
+
+    def apply(self, recipe_ids):
+        features = recipe_features(recipe_ids)
+        stale = [self.rows.pop(recipe_id) for recipe_id in recipe_ids
+                 if recipe_id in self.rows]
+        if stale:
+            mask = np.ones(self.matrix.shape[0], dtype=np.float32)
+            mask[stale] = 0
+            self.matrix = sparse.diags(mask) @ self.matrix
+            self.matrix.eliminate_zeros()
+        if not features:
+            return
+        new_columns = {feature for recipe in features.values()
+                       for feature in recipe} - set(self.columns)
+        for feature in new_columns:
+            self.columns[feature] = len(self.columns)
+        if new_columns:
+            # Для новых признаков берём вес самого редкого признака.
+            self.idf = np.append(
+                self.idf,
+                np.full(len(new_columns), self.idf.max(initial=1),
+                        dtype=np.float32),
+            )
+            self.matrix.resize((self.matrix.shape[0], len(self.columns)))
+        indptr = [0]
+        indices = []
+        for offset, recipe_id in enumerate(sorted(features)):
+            self.rows[recipe_id] = self.matrix.shape[0] + offset
+            indices.extend(sorted(
+                self.columns[feature] for feature in features[recipe_id]
+            ))
+            indptr.append(len(indices))
+        indices = np.array(indices, dtype=np.int32)
+        block = _normalize(sparse.csr_matrix(
+            (self.idf[indices], indices, indptr),
+            shape=(len(features), len(self.columns)),
+        ))
+        self.matrix = sparse.vstack([self.matrix, block], format='csr')
+        self.recipe_ids = np.append(self.recipe_ids, sorted(features))
+
+    def neighbours(self, recipe_id, k):
+        """
+        Возвращает k рецептов, ближайших к заданному.
+
+        Returns:
+            list: Пары (id рецепта, косинусная близость) по убыванию
+                близости.
+        """
+        self.refresh()
+        with self.lock:
+            row = self.rows.get(recipe_id)
+            if row is None:
+                return []
+            scores = (self.matrix @ self.matrix[row].T).toarray().ravel()
+            scores[row] = 0
+            return _top_k(scores, self.recipe_ids, k)
+
+    def iter_neighbours(self, k, batch_size):
+        """
+        Перебирает соседей всех рецептов пачками строк матрицы.
+
+        Yields:
+            tuple: id рецепта и список его соседей, как в neighbours.
+        """
+        rows = sorted(self.rows.items(), key=lambda item: item[1])
+        transposed = self.matrix.T.tocsc()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            scores = (
+                self.matrix[[row for _, row in batch]] @ transposed
+            ).toarray()
+            for position, (recipe_id, row) in enumerate(batch):
+                scores[position, row] = 0
+                yield recipe_id, _top_k(scores[position], self.recipe_ids, k)
+
+    def save_snapshot(self, path, generation):
+        """Атомарно сохраняет матрицу и номер поколения журнала на диск."""
+        features = sorted(self.columns, key=self.columns.get)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+            np.savez(
+                file,
+                data=self.matrix.data,
+                indices=self.matrix.indices,
+                indptr=self.matrix.indptr,
+                shape=self.matrix.shape,
+                recipe_ids=self.recipe_ids,
+                idf=self.idf,
+                feature_kinds=[kind for kind, _ in features],
+                feature_ids=[pk for _, pk in features],
+                generation=generation,
+            )
+        os.replace(file.name, path)
+
+    def load_snapshot(self, path):
+        """
+        Загружает снимок матрицы с диска.
+
+        Returns:
+            int: Поколение журнала, на котором снят снимок, или None,
+                если снимка нет.
+        """
+        try:
+            snapshot = np.load(path)
+        except FileNotFoundError:
+            return None
+        with snapshot:
+            self.matrix = sparse.csr_matrix(
+                (snapshot['data'], snapshot['indices'], snapshot['indptr']),
+                shape=tuple(snapshot['shape']),
+            )
+            self.recipe_ids = snapshot['recipe_ids']
+            self.idf = snapshot['idf']
+            self.columns = {
+                (str(kind), int(pk)): column
+                for column, (kind, pk) in enumerate(zip(
+                    snapshot['feature_kinds'], snapshot['feature_ids']
+                ))
+            }
+            generation = int(snapshot['generation'])
+        # Пустые строки — рецепты, заменённые до снятия снимка.
+        self.rows = {
+            int(self.recipe_ids[row]): int(row)
+            for row in np.flatnonzero(np.diff(self.matrix.indptr))
+        }
+        return generation
+
+
+similar_index = SimilarIndex()
+
+
+@task
+def refresh_similar_recipes(recipe_id):
+    """
+    Пересчитывает соседей изменённого рецепта (фоновая задача).
+
+    Вместе с ним сбрасываются рецепты из его прежнего и нового списков
+    похожих: близость симметрична, и рецепт мог в них войти или выпасть.
+    """
+    key = SIMILAR_RECIPES_KEY.format(recipe_id)
+    previous = cache.get(key, [])
+    neighbours = similar_index.neighbours(
+        recipe_id, settings.SIMILAR_RECIPES_LIMIT
+    )
+    cache.delete_many([SIMILAR_RECIPES_KEY.format(pk)
+                       for pk, _ in previous + neighbours])
+    cache.set(key, neighbours, settings.SIMILAR_RECIPES_CACHE_TTL)
+
+
+def get_similar_recipes(recipe_id):
+    """
+    Возвращает похожие рецепты из кэша, при промахе считает по индексу.
+
+    Returns:
+        list: Пары (id рецепта, косинусная близость).
+    """
+    key = SIMILAR_RECIPES_KEY.format(recipe_id)
+    neighbours = cache.get(key)
+    if neighbours is None:
+        neighbours = similar_index.neighbours(
+            recipe_id, settings.SIMILAR_RECIPES_LIMIT
+        )
+        cache.set(key, neighbours, settings.SIMILAR_RECIPES_CACHE_TTL)
+    return neighbours
@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.services import aggregate_recipe_scores
+from recipes.models import RecipeEvent
+
+
+class Command(BaseCommand):
+    help = ('recompute popular and trending recipe scores from the '
+            'favorite and shopping cart event log')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true',
+                            help='delete events older than the score window')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scored = aggregate_recipe_scores()
+        self.stdout.write(
+            f'scored {scored} recipes, {time.perf_counter() - started:.1f}s'
+        )
+        if options['prune']:
+            deleted, _ = RecipeEvent.objects.filter(
+                created__lt=timezone.now() - timedelta(
+                    days=settings.RECIPE_SCORE_WINDOW_DAYS)
+            ).delete()
+            self.stdout.write(f'pruned {deleted} events')
@@ -0,0 +1,129 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('concurrency benchmark: compare WSGI and ASGI deployments '
+            'of read endpoints')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', type=str,
+                            help='full URLs, one per deployment to compare')
+        parser.add_argument('--concurrency', '-c', default=200, type=int)
+        parser.add_argument('--requests', '-n', default=2000, type=int)
+        parser.add_argument('--token', default='', type=str,
+                            help='auth token for /users/subscriptions/')
+        parser.add_argument('--timeout', default=30, type=float)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('concurrency и requests должны быть больше 0')
+        self.stdout.write(
+            f'{"url":<50} {"rps":>9} {"p50 ms":>9} {"p95 ms":>9} '
+            f'{"p99 ms":>9} {"errors":>7}'
+        )
+        for url in options['urls']:
+            result = asyncio.run(self.run(url, options))
+            self.stdout.write(
+                f'{url:<50} {result["rps"]:>9.1f} {result["p50"]:>9.1f} '
+                f'{result["p95"]:>9.1f} {result["p99"]:>9.1f} '
+                f'{result["errors"]:>7}'
+            )
+
+    async def run(self, url, options):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise CommandError('Поддерживается только http://')
+        request = self.build_request(parts, options['token'])
+        queue = asyncio.Queue()
+        for _ in range(options['requests']):
+            queue.put_nowait(None)
+        latencies = []
+        errors = []
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self.worker(parts, request, queue, latencies, errors,
+                        options['timeout'])
+            for _ in range(options['concurrency'])
+        ))
+        elapsed = time.perf_counter() - started
+        if not latencies:
+            raise CommandError(f'{url}: нет успешных ответов ({errors[:1]})')
+        latencies.sort()
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+            'errors': len(errors),
+        }
+
+    def build_request(self, parts, token):
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        headers = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}',
+                   'Connection: keep-alive']
+        if token:
+            headers.append(f'Authorization: Token {token}')
+        return ('\r\n'.join(headers) + '\r\n\r\n').encode()
+
+    async def worker(self, parts, request, queue, latencies, errors,
+                     timeout):
+        reader = writer = None
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(
+                        parts.hostname, parts.port or 80)
+                writer.write(request)
+                status, keep_alive = await asyncio.wait_for(
+                    self.read_response(reader), timeout)
+            except (OSError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError, ValueError) as error:
+                errors.append(error)
+                keep_alive = False
+            else:
+                if status >= 400:
+                    errors.append(status)
+                else:
+                    latencies.append(time.perf_counter() - started)
+            if not keep_alive and writer is not None:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    async def read_response(self, reader):
+        status_line = await reader.readline()
+        status = int(status_line.split()[1])
+        length = 0
+        chunked = False
+        keep_alive = True
+        while True:
+            line = (await reader.readline()).strip().lower()
+            if not line:
+                break
+            name, _, value = line.partition(b':')
+            value = value.strip()
+            if name == b'content-length':
+                length = int(value)
+            elif name == b'transfer-encoding' and value == b'chunked':
+                chunked = True
+            elif name == b'connection' and value == b'close':
+                keep_alive = False
+        if chunked:
+            while True:
+                size = int((await reader.readline()).strip(), 16)
+                await reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif length:
+            await reader.readexactly(length)
+        return status, keep_alive
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.documents import BATCH_SIZE, build_documents
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'build the pre-rendered JSON documents of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', default=BATCH_SIZE, type=int,
+                            help='recipes rendered per transaction')
+        parser.add_argument('--missing', action='store_true',
+                            help='only recipes without a document')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('batch-size должен быть больше 0')
+        started = time.perf_counter()
+        queryset = Recipe.objects.all()
+        if options['missing']:
+            queryset = queryset.filter(document__isnull=True)
+        built = build_documents(queryset, options['batch_size'])
+        self.stdout.write(
+            f'built {built} documents, '
+            f'{time.perf_counter() - started:.1f}s'
+        )
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from api.indexes import (CHANGELOG_GENERATION_KEY, SIMILAR_RECIPES_KEY,
+                         SimilarIndex)
+
+
+class Command(BaseCommand):
+    help = ('build the recipe similarity matrix, save its snapshot '
+            'and warm the similar recipes cache')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', default=128, type=int,
+                            help='recipes scored per matrix product')
+        parser.add_argument('--no-warm', action='store_true',
+                            help='only save the snapshot')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('batch-size должен быть больше 0')
+        started = time.perf_counter()
+        # Поколение читаем до построения: изменения во время сборки
+        # воркеры применят повторно, это безопасно.
+        generation = cache.get(CHANGELOG_GENERATION_KEY, 0)
+        index = SimilarIndex()
+        index.build_from_db()
+        index.save_snapshot(settings.SIMILAR_RECIPES_SNAPSHOT, generation)
+        self.stdout.write(
+            f'matrix {index.matrix.shape[0]}x{index.matrix.shape[1]}, '
+            f'nnz {index.matrix.nnz}, '
+            f'{time.perf_counter() - started:.1f}s'
+        )
+        if options['no_warm']:
+            return
+        batch = {}
+        warmed = 0
+        for recipe_id, neighbours in index.iter_neighbours(
+            settings.SIMILAR_RECIPES_LIMIT, options['batch_size']
+        ):
+            batch[SIMILAR_RECIPES_KEY.format(recipe_id)] = neighbours
+            if len(batch) >= options['batch_size']:
+                cache.set_many(batch, settings.SIMILAR_RECIPES_CACHE_TTL)
+                warmed += len(batch)
+                batch = {}
+        cache.set_many(batch, settings.SIMILAR_RECIPES_CACHE_TTL)
+        warmed += len(batch)
+        self.stdout.write(
+            f'cached {warmed} recipes, '
+            f'{time.perf_counter() - started:.1f}s'
+        )
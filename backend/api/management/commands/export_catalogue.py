@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalogue import export_catalogue
+
+
+class Command(BaseCommand):
+    help = ('write the public recipe catalogue as static pre-compressed '
+            'JSON files for nginx')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='output directory, '
+                            'CATALOGUE_ROOT by default')
+        parser.add_argument('--max-tags', type=int,
+                            help='largest tag combination with its own list')
+        parser.add_argument('--full', action='store_true',
+                            help='ignore the previous manifest')
+
+    def handle(self, *args, **options):
+        if options['max_tags'] is not None and options['max_tags'] < 0:
+            raise CommandError('max-tags не может быть меньше 0')
+        started = time.perf_counter()
+        stats = export_catalogue(options['root'], options['max_tags'],
+                                 options['full'])
+        self.stdout.write(
+            f'{stats["recipes"]} recipes rebuilt, '
+            f'{stats["written"]} files written, '
+            f'{stats["removed"]} removed, '
+            f'{time.perf_counter() - started:.1f}s'
+        )
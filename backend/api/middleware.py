@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from api.compression import (choose_encoding, compress, compress_stream,
+                             is_compressible)
+
+STRONG_ETAG = _lazy_re_compile(r'^\s*"')
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов gzip или brotli.
+
+    Сжимаются текстовые и JSON-ответы от COMPRESSION_MIN_SIZE байт
+    и потоковые ответы (StreamingHttpResponse) любого размера.
+    Ответы, уже имеющие Content-Encoding (например, из кэша сжатых
+    ответов), не трогаются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.has_header('Content-Encoding')
+                or not is_compressible(response.get('Content-Type', ''))):
+            return response
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        # Сжатое тело отличается побайтно: сильный ETag становится слабым.
+        etag = response.get('ETag')
+        if etag and STRONG_ETAG.match(etag):
+            response['ETag'] = STRONG_ETAG.sub('W/"', etag)
+        response['Content-Encoding'] = encoding
+        return response
@@ -1,5 +1,86 @@
+import hashlib
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
 
+from api.cache import get_or_build
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк queryset по статистике Postgres.
+
+    Для запроса без условий берётся pg_class.reltuples таблицы, иначе
+    (или если статистика ещё не собрана) - число строк из плана EXPLAIN.
+    Возвращает None для других СУБД.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            if row is not None and row[0] >= 0:
+                return int(row[0])
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор с оценкой общего числа строк для больших таблиц.
+
+    Для queryset без условий, если оценка Postgres не меньше
+    ESTIMATED_COUNT_THRESHOLD, count берётся из статистики вместо
+    SELECT COUNT(*) по всей таблице. Отфильтрованные и небольшие
+    выборки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if (estimate is not None
+                    and estimate >= settings.ESTIMATED_COUNT_THRESHOLD):
+                return estimate
+        return super().count
+
+
+class CachedCountPaginator(EstimatedCountPaginator):
+    """
+    Пагинатор API: оценка для больших списков без фильтров, точное
+    число строк для остальных кэшируется на COUNT_CACHE_TTL секунд.
+
+    Ключ кэша - хэш SQL запроса с параметрами, то есть набор фильтров
+    (включая пользователя для is_favorited и подобных), поэтому
+    листание страниц одной выборки не повторяет COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or not queryset.query.where:
+            return super().count
+        sql, params = queryset.query.sql_with_params()
+        key = 'count:' + hashlib.sha256(
+            f'{queryset.db}:{sql}:{params}'.encode()
+        ).hexdigest()
+        return get_or_build(
+            key, lambda: super(CachedCountPaginator, self).count,
+            settings.COUNT_CACHE_TTL,
+        )
+
 
 class CustumPagination(PageNumberPagination):
     """
@@ -9,3 +90,14 @@ class CustumPagination(PageNumberPagination):
     """
 
     page_size_query_param = 'limit'
+
+
+class EstimatedCountPagination(CustumPagination):
+    """
+    Пагинация больших списков без COUNT(*) на каждой странице.
+
+    Формат ответа тот же, что у CustumPagination; count может быть
+    оценкой (см. CachedCountPaginator).
+    """
+
+    django_paginator_class = CachedCountPaginator
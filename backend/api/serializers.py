@@ -1,14 +1,103 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField
 
-from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredients,
-                            ShoppingCart, Tag)
+from api.events import publish_recipe_created
+from api.indexes import notify_recipe_changed
+from recipes.models import (Favourite, Ingredient, PantryItem, Recipe,
+                            RecipeIngredients, ShoppingCart, Tag)
 from users.models import Follow, User
 
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+# Поля рецепта, зависящие от текущего пользователя
+USER_FLAGS = ("is_favorited", "is_in_shopping_cart", "is_subscribed")
+
+
+def get_fieldset(request, path=""):
+    """
+    Разбирает параметры запроса fields и omit для заданного уровня вложенности.
+
+    Поля перечисляются через запятую, для вложенных сериализаторов
+    используется точечная нотация: fields=id,name,author.username.
+
+    Args:
+        request: Объект запроса.
+        path: Путь до вложенного сериализатора, например "author".
+
+    Returns:
+        tuple: Множество запрошенных полей (None, если ограничений нет)
+            и множество исключённых полей.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    prefix = f"{path}." if path else ""
+    only = set()
+    restricted = False
+    for name in _split_param(request, FIELDS_PARAM):
+        if name == path:
+            return None, _get_omitted(request, prefix)
+        if name.startswith(prefix):
+            restricted = True
+            only.add(name[len(prefix):].split(".")[0])
+    return (only if restricted else None), _get_omitted(request, prefix)
+
+
+def is_field_requested(request, name):
+    """Проверяет, попадёт ли поле верхнего уровня в ответ."""
+    only, omit = get_fieldset(request)
+    return (only is None or name in only) and name not in omit
+
+
+def _split_param(request, param):
+    value = request.query_params.get(param, "")
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def _get_omitted(request, prefix):
+    return {
+        name[len(prefix):]
+        for name in _split_param(request, OMIT_PARAM)
+        if name.startswith(prefix) and "." not in name[len(prefix):]
+    }
+
+
+class SparseFieldsetMixin:
+    """
+    Миксин для выборочной сериализации полей (sparse fieldsets).
+
+    Оставляет в представлении только поля из параметра запроса fields и
+    убирает поля из параметра omit. Применяется только к безопасным
+    методам, поэтому не влияет на запись.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, omit = get_fieldset(
+            self.context.get("request"), self._get_fieldset_path()
+        )
+        for name in list(fields):
+            if (only is not None and name not in only) or name in omit:
+                fields.pop(name)
+        return fields
+
+    def _get_fieldset_path(self):
+        names = []
+        field = self
+        while field.parent is not None:
+            if field.field_name:
+                names.append(field.field_name)
+            field = field.parent
+        return ".".join(reversed(names))
+
 
 class TagsSerializer(serializers.ModelSerializer):
     """
@@ -23,7 +112,7 @@ class TagsSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "color", "slug")
 
 
-class MyUserSerializer(UserSerializer):
+class MyUserSerializer(SparseFieldsetMixin, UserSerializer):
     """
     Сериализатор для модели User с дополнительным полем is_subscribed.
 
@@ -31,6 +120,8 @@ class MyUserSerializer(UserSerializer):
     и обратно при выполнении операций сериализации и десериализации. Добавляет
     дополнительное поле is_subscribed, которое указывает, подписан ли текущий
     пользователь на данного пользователя.
+
+    Поддерживает параметры запроса fields и omit (SparseFieldsetMixin).
     """
 
     is_subscribed = SerializerMethodField(read_only=True)
@@ -51,6 +142,8 @@ class MyUserSerializer(UserSerializer):
 
         Возвращает True, если текущий пользователь аутентифицирован и
         подписан на данного пользователя, иначе возвращает False.
+        Если queryset аннотирован флагом is_subscribed, запрос к БД
+        не выполняется.
 
         Args:
             obj: Объект пользователя, для которого проверяется подписка.
@@ -58,6 +151,9 @@ class MyUserSerializer(UserSerializer):
         Returns:
             bool: Значение поля is_subscribed для данного пользователя.
         """
+        annotated = getattr(obj, "is_subscribed", None)
+        if annotated is not None:
+            return annotated
         user = self.context.get("request").user
         return (
             user.is_authenticated
@@ -65,6 +161,27 @@ class MyUserSerializer(UserSerializer):
         )
 
 
+class AuthorPublicSerializer(MyUserSerializer):
+    """Автор рецепта без флага подписки текущего пользователя."""
+
+    class Meta(MyUserSerializer.Meta):
+        fields = tuple(name for name in MyUserSerializer.Meta.fields
+                       if name not in USER_FLAGS)
+
+
+class UserRecipesCountSerializer(MyUserSerializer):
+    """
+    Сериализатор пользователя с числом его рецептов.
+
+    Поле recipes_count берётся из аннотации queryset.
+    """
+
+    recipes_count = serializers.IntegerField(read_only=True)
+
+    class Meta(MyUserSerializer.Meta):
+        fields = MyUserSerializer.Meta.fields + ("recipes_count",)
+
+
 class FollowSerializer(MyUserSerializer):
     """
     Сериализатор для модели Follow с дополнительными recipes и recipes_count.
@@ -116,6 +233,154 @@ class FollowSerializer(MyUserSerializer):
         return serializer.data
 
 
+class IdListSerializer(serializers.Serializer):
+    """
+    Сериализатор списка идентификаторов для пакетных операций.
+
+    Повторяющиеся идентификаторы отбрасываются с сохранением порядка,
+    размер списка ограничен настройкой BULK_IDS_MAX.
+    """
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_IDS_MAX,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class RecipeServingsSerializer(serializers.Serializer):
+    """Рецепт и число порций для списка покупок."""
+
+    id = serializers.IntegerField(min_value=1)
+    servings = serializers.DecimalField(
+        max_digits=6, decimal_places=2, min_value=Decimal("0.01"),
+        default=Decimal(1),
+    )
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса списка покупок по набору рецептов.
+
+    Порции повторяющихся рецептов складываются, число рецептов
+    ограничено настройкой BULK_IDS_MAX.
+    """
+
+    recipes = RecipeServingsSerializer(many=True, allow_empty=False)
+
+    def validate_recipes(self, value):
+        if len(value) > settings.BULK_IDS_MAX:
+            raise ValidationError(
+                f"Не больше {settings.BULK_IDS_MAX} рецептов"
+            )
+        servings = {}
+        for item in value:
+            servings[item["id"]] = (
+                servings.get(item["id"], 0) + item["servings"]
+            )
+        return servings
+
+
+class PantryItemSerializer(serializers.ModelSerializer):
+    """Сериализатор позиции запасов пользователя."""
+
+    id = serializers.ReadOnlyField(source="ingredient.id")
+    name = serializers.ReadOnlyField(source="ingredient.name")
+    measurement_unit = serializers.ReadOnlyField(
+        source="ingredient.measurement_unit"
+    )
+
+    class Meta:
+        model = PantryItem
+        fields = ("id", "name", "measurement_unit", "amount")
+
+
+class PantryAmountSerializer(serializers.Serializer):
+    """Ингредиент и его количество в запасах."""
+
+    id = serializers.IntegerField(min_value=1)
+    amount = serializers.IntegerField(min_value=0)
+
+
+class PantryEditSerializer(serializers.Serializer):
+    """
+    Сериализатор пакетного изменения запасов.
+
+    Возвращает словарь {id ингредиента: количество}, существование
+    ингредиентов проверяется одним запросом.
+    """
+
+    items = PantryAmountSerializer(many=True)
+
+    def validate_items(self, value):
+        if len(value) > settings.BULK_IDS_MAX:
+            raise ValidationError(
+                f"Не больше {settings.BULK_IDS_MAX} позиций"
+            )
+        amounts = {item["id"]: item["amount"] for item in value}
+        found = set(
+            Ingredient.objects.filter(pk__in=amounts)
+            .values_list("pk", flat=True)
+        )
+        missing = [pk for pk in amounts if pk not in found]
+        if missing:
+            raise ValidationError(f"Ингредиенты не найдены: {missing}")
+        return amounts
+
+
+class CommaSeparatedIdsField(serializers.CharField):
+    """
+    Поле со списком идентификаторов через запятую: 1,2,3.
+
+    Повторы отбрасываются с сохранением порядка, длина списка
+    ограничена настройкой BULK_IDS_MAX.
+    """
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        try:
+            ids = [int(pk) for pk in value.split(",") if pk.strip()]
+        except ValueError:
+            raise ValidationError("Ожидается список id через запятую")
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > settings.BULK_IDS_MAX:
+            raise ValidationError(f"Не больше {settings.BULK_IDS_MAX} id")
+        return ids
+
+
+class CookableQuerySerializer(serializers.Serializer):
+    """
+    Сериализатор параметров подбора рецептов по имеющимся ингредиентам.
+
+    Ингредиенты перечисляются через запятую: ingredients=1,2,3.
+    Без параметра ingredients используются запасы пользователя.
+    """
+
+    ingredients = CommaSeparatedIdsField(required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.COOKABLE_MAX_LIMIT, default=10
+    )
+
+
+class RecipeBatchQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров пакетного получения рецептов: ids=1,2,3."""
+
+    ids = CommaSeparatedIdsField()
+
+
+class SimilarQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров списка похожих рецептов."""
+
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SIMILAR_RECIPES_LIMIT,
+        default=settings.SIMILAR_RECIPES_LIMIT,
+    )
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели Ingredient.
@@ -177,12 +442,13 @@ class IngredientInRecipeCreateSerializer(ModelSerializer):
         fields = ("id", "amount", "name", "measurement_unit")
 
 
-class RecipeReadSerializer(ModelSerializer):
+class RecipeReadSerializer(SparseFieldsetMixin, ModelSerializer):
     """
     Сериализатор для чтения рецепта.
 
     Сериализатор, используемый для преобразования рецепта в JSON-представление
-    при операциях чтения.
+    при операциях чтения. Поддерживает параметры запроса fields и omit
+    (SparseFieldsetMixin), в том числе для вложенного автора: author.username.
 
     Attributes:
         tags: Сериализатор TagsSerializer для сериализации связанных тегов.
@@ -226,6 +492,9 @@ class RecipeReadSerializer(ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
+        annotated = getattr(obj, "is_favorited", None)
+        if annotated is not None:
+            return annotated
         user = self.context["request"].user
         return (
             user.is_authenticated
@@ -233,6 +502,9 @@ class RecipeReadSerializer(ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        annotated = getattr(obj, "is_in_shopping_cart", None)
+        if annotated is not None:
+            return annotated
         user = self.context["request"].user
         return (
             user.is_authenticated
@@ -240,6 +512,79 @@ class RecipeReadSerializer(ModelSerializer):
         )
 
 
+class RecipePublicSerializer(RecipeReadSerializer):
+    """
+    Публичная часть рецепта для документа RecipeDocument.
+
+    Совпадает с RecipeReadSerializer без флагов текущего пользователя,
+    изображение отдаётся относительной ссылкой.
+    """
+
+    author = AuthorPublicSerializer(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = tuple(name for name in RecipeReadSerializer.Meta.fields
+                       if name not in USER_FLAGS)
+
+
+class RecipeDocumentSerializer(RecipeReadSerializer):
+    """
+    Сериализатор для чтения рецепта из готового документа.
+
+    Публичные поля берутся из RecipeDocument без запросов тегов,
+    ингредиентов и автора, в них подставляются флаги текущего
+    пользователя: is_favorited, is_in_shopping_cart и author.is_subscribed
+    (аннотация author_is_subscribed). Параметры fields и omit
+    учитываются так же, как в RecipeReadSerializer. Рецепт без документа
+    сериализуется обычным образом, связи таких рецептов страницы
+    подгружает RecipeViewSet.paginate_queryset.
+    """
+
+    def to_representation(self, instance):
+        try:
+            document = instance.document.data
+        except ObjectDoesNotExist:
+            return super().to_representation(instance)
+        data = {}
+        for name, field in self.fields.items():
+            if name == "author":
+                data[name] = self._get_author(instance, document[name],
+                                              field)
+            elif name in USER_FLAGS:
+                data[name] = field.to_representation(instance)
+            elif name == "image":
+                data[name] = self._get_image_url(document[name])
+            else:
+                data[name] = document[name]
+        return data
+
+    def _get_author(self, instance, author, field):
+        data = {}
+        for name in field.fields:
+            if name == "is_subscribed":
+                data[name] = self._is_subscribed(instance)
+            else:
+                data[name] = author[name]
+        return data
+
+    def _is_subscribed(self, instance):
+        annotated = getattr(instance, "author_is_subscribed", None)
+        if annotated is not None:
+            return annotated
+        user = self.context["request"].user
+        return (
+            user.is_authenticated
+            and Follow.objects.filter(user=user,
+                                      author_id=instance.author_id).exists()
+        )
+
+    def _get_image_url(self, url):
+        request = self.context.get("request")
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class RecipeCreateSerializer(ModelSerializer):
     """
     Сериализатор для создания рецепта.
@@ -347,6 +692,11 @@ class RecipeCreateSerializer(ModelSerializer):
         ]
 
         RecipeIngredients.objects.bulk_create(Recipe_bulk)
+        notify_recipe_changed(recipe.id)
+        publish_recipe_created(
+            recipe.author_id,
+            RecipeShortSerializer(recipe, context=self.context).data,
+        )
         return recipe
 
     def update(self, instance, validated_data):
@@ -377,4 +727,5 @@ class RecipeCreateSerializer(ModelSerializer):
                     ingredient=ingredient.get("id"),
                     defaults={"amount": amount},
                 )
+            notify_recipe_changed(instance.id)
         return super().update(instance, validated_data)
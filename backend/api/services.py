@@ -0,0 +1,343 @@
+"""
+Сервисы для изменения связей пользователя с объектами.
+
+RelationToggle добавляет и удаляет связи "пользователь - объект"
+(избранное, список покупок, подписки) не более чем за два запроса к БД:
+- добавление: объект с флагом существующей связи одним запросом и
+  INSERT ... ON CONFLICT DO NOTHING (bulk_create с ignore_conflicts),
+  поэтому повторный клик не приводит к IntegrityError; если связь
+  пишет события, INSERT выполняется в точке сохранения, и конфликт
+  уникальности означает, что связь уже создана параллельным запросом;
+- удаление: один DELETE с подсчётом строк, существование объекта
+  проверяется только если ничего не удалено.
+
+Пакетные варианты (add_many, remove_many) проверяют весь список
+идентификаторов одним запросом и меняют связи одним запросом,
+возвращая статус для каждого идентификатора.
+
+replace_shopping_cart и clear_shopping_cart меняют список покупок
+целиком в одной транзакции, replace_pantry и update_pantry так же
+меняют запасы пользователя.
+
+Добавления и удаления рецептов в избранное и список покупок, в том
+числе заменой и очисткой списка целиком, пишутся в журнал RecipeEvent,
+по которому aggregate_recipe_scores периодически пересчитывает
+популярность.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from recipes.models import (Favourite, PantryItem, Recipe, RecipeEvent,
+                            RecipeScore, ShoppingCart)
+from users.models import Follow, User
+
+
+class RelationToggle:
+    """
+    Связь пользователя с объектом через промежуточную модель.
+
+    model - модель связи с полем user.
+    target_model - модель объекта связи.
+    target_field - поле модели связи, ссылающееся на объект.
+    event_kind - тип RecipeEvent, который пишется при изменении связи
+    с рецептом (для расчёта популярности), None - события не пишутся.
+    """
+
+    def __init__(self, model, target_model, target_field, event_kind=None):
+        self.model = model
+        self.target_model = target_model
+        self.target_field = target_field
+        self.event_kind = event_kind
+
+    def relation(self, user, target):
+        return self.model.objects.filter(
+            user=user, **{self.target_field: target}
+        )
+
+    def annotate(self, queryset, user, name='is_related', target='pk'):
+        """
+        Добавляет к queryset флаг связи пользователя с объектом,
+        на который указывает поле target (по умолчанию сам объект).
+        """
+        return queryset.annotate(
+            **{name: Exists(self.relation(user, OuterRef(target)))}
+        )
+
+    def get_target(self, user, pk):
+        """
+        Возвращает объект или 404 одним запросом.
+
+        У объекта заполнен флаг is_related - связь с пользователем уже есть.
+        """
+        queryset = self.annotate(self.target_model.objects.all(), user)
+        return get_object_or_404(queryset, pk=pk)
+
+    def record(self, user, pks, delta):
+        """Пишет события изменения связи одним INSERT."""
+        if self.event_kind is None or not pks:
+            return
+        RecipeEvent.objects.bulk_create(
+            RecipeEvent(user=user, recipe_id=pk, kind=self.event_kind,
+                        delta=delta)
+            for pk in pks
+        )
+
+    def add(self, user, target):
+        """
+        Создаёт связь, если её ещё нет.
+
+        Событие пишется, только если строка действительно вставлена.
+        """
+        relation = self.model(user=user, **{self.target_field: target})
+        if self.event_kind is None:
+            self.model.objects.bulk_create([relation], ignore_conflicts=True)
+            return
+        try:
+            with transaction.atomic():
+                relation.save(force_insert=True)
+        except IntegrityError:
+            return
+        self.record(user, [target.pk], 1)
+
+    def remove(self, user, pk):
+        """
+        Удаляет связь одним запросом.
+
+        Возвращает False, если связи не было, и 404, если нет объекта.
+        """
+        deleted, _ = self.relation(user, pk).delete()
+        if not deleted:
+            get_object_or_404(self.target_model.objects.only('pk'), pk=pk)
+        else:
+            self.record(user, [pk], -1)
+        return bool(deleted)
+
+    def get_related_flags(self, user, pks):
+        """Одним запросом: {pk: есть ли связь} для существующих объектов."""
+        return dict(
+            self.annotate(self.target_model.objects.filter(pk__in=pks), user)
+            .values_list('pk', 'is_related')
+        )
+
+    def add_many(self, user, pks, excluded=()):
+        """
+        Создаёт связи с объектами из списка pks одним INSERT.
+
+        Возвращает статусы: added, exists, not_found, forbidden
+        (для pks из excluded).
+        """
+        flags = self.get_related_flags(user, pks)
+        statuses = []
+        new = []
+        for pk in pks:
+            if pk in excluded:
+                status = 'forbidden'
+            elif pk not in flags:
+                status = 'not_found'
+            elif flags[pk]:
+                status = 'exists'
+            else:
+                status = 'added'
+                new.append(
+                    self.model(user=user, **{f'{self.target_field}_id': pk})
+                )
+            statuses.append({'id': pk, 'status': status})
+        if new:
+            self.model.objects.bulk_create(new, ignore_conflicts=True)
+            self.record(user, [getattr(relation, f'{self.target_field}_id')
+                               for relation in new], 1)
+        return statuses
+
+    def remove_many(self, user, pks):
+        """
+        Удаляет связи с объектами из списка pks одним DELETE.
+
+        Возвращает статусы: removed, missing, not_found.
+        """
+        flags = self.get_related_flags(user, pks)
+        related = [pk for pk in pks if flags.get(pk)]
+        if related:
+            self.model.objects.filter(
+                user=user, **{f'{self.target_field}__in': related}
+            ).delete()
+            self.record(user, related, -1)
+        return [
+            {'id': pk,
+             'status': ('not_found' if pk not in flags
+                        else 'removed' if flags[pk] else 'missing')}
+            for pk in pks
+        ]
+
+
+favorite_toggle = RelationToggle(Favourite, Recipe, 'recipe',
+                                 RecipeEvent.FAVORITE)
+shopping_cart_toggle = RelationToggle(ShoppingCart, Recipe, 'recipe',
+                                      RecipeEvent.SHOPPING_CART)
+subscription_toggle = RelationToggle(Follow, User, 'author')
+
+
+def _lock_user(user):
+    """Блокирует строку пользователя до конца транзакции."""
+    # Блокировка берётся только на основной базе (foodgram.db_router).
+    User.objects.using(router.db_for_write(User)).select_for_update().filter(
+        pk=user.pk
+    ).exists()
+
+
+def replace_shopping_cart(user, pks):
+    """
+    Заменяет содержимое списка покупок рецептами из pks.
+
+    Выполняется в одной транзакции под блокировкой пользователя,
+    поэтому параллельные замены и очистки не перемешиваются.
+    Если части рецептов нет, список не меняется.
+
+    Возвращает список отсутствующих идентификаторов.
+    """
+    with transaction.atomic():
+        _lock_user(user)
+        found = set(
+            Recipe.objects.filter(pk__in=pks).values_list('pk', flat=True)
+        )
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            return missing
+        current = set(
+            ShoppingCart.objects.filter(user=user)
+            .values_list('recipe_id', flat=True)
+        )
+        removed = list(current - found)
+        added = [pk for pk in dict.fromkeys(pks) if pk not in current]
+        if removed:
+            ShoppingCart.objects.filter(
+                user=user, recipe_id__in=removed
+            ).delete()
+            shopping_cart_toggle.record(user, removed, -1)
+        if added:
+            ShoppingCart.objects.bulk_create(
+                [ShoppingCart(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True,
+            )
+            shopping_cart_toggle.record(user, added, 1)
+    return []
+
+
+def clear_shopping_cart(user):
+    """Очищает список покупок в транзакции под блокировкой пользователя."""
+    with transaction.atomic():
+        _lock_user(user)
+        removed = list(
+            ShoppingCart.objects.filter(user=user)
+            .values_list('recipe_id', flat=True)
+        )
+        if removed:
+            ShoppingCart.objects.filter(user=user).delete()
+            shopping_cart_toggle.record(user, removed, -1)
+
+
+def replace_pantry(user, amounts):
+    """Заменяет запасы пользователя на {id ингредиента: количество}."""
+    with transaction.atomic():
+        PantryItem.objects.filter(user=user).delete()
+        _create_pantry_items(user, amounts)
+
+
+def update_pantry(user, amounts):
+    """
+    Меняет перечисленные позиции запасов, количество 0 удаляет позицию.
+    """
+    with transaction.atomic():
+        PantryItem.objects.filter(
+            user=user, ingredient_id__in=amounts
+        ).delete()
+        _create_pantry_items(user, amounts)
+
+
+def _create_pantry_items(user, amounts):
+    PantryItem.objects.bulk_create(
+        PantryItem(user=user, ingredient_id=ingredient_id, amount=amount)
+        for ingredient_id, amount in amounts.items()
+        if amount
+    )
+
+
+def _decayed_scores(since, now, truncate, half_life):
+    """
+    Суммирует события после since с экспоненциальным затуханием.
+
+    События группируются в БД по рецепту, типу и интервалу truncate,
+    затухание считается для каждой группы по началу интервала.
+
+    Возвращает {id рецепта: оценка}.
+    """
+    weights = settings.RECIPE_SCORE_WEIGHTS
+    groups = (
+        RecipeEvent.objects.filter(created__gte=since)
+        .annotate(bucket=truncate('created'))
+        .values('recipe_id', 'kind', 'bucket')
+        .annotate(total=Sum('delta'))
+        .values_list('recipe_id', 'kind', 'bucket', 'total')
+    )
+    scores = {}
+    for recipe_id, kind, bucket, total in groups.iterator():
+        age = (now - bucket).total_seconds()
+        scores[recipe_id] = scores.get(recipe_id, 0) + (
+            total * weights.get(kind, 0) * 0.5 ** (age / half_life)
+        )
+    return scores
+
+
+def aggregate_recipe_scores(now=None):
+    """
+    Пересчитывает таблицу RecipeScore по журналу событий.
+
+    popular - события за RECIPE_SCORE_WINDOW_DAYS дней с периодом
+    полураспада RECIPE_SCORE_POPULAR_HALF_LIFE дней, trending - события
+    за RECIPE_SCORE_TRENDING_WINDOW_HOURS часов с периодом полураспада
+    RECIPE_SCORE_TRENDING_HALF_LIFE часов.
+
+    У каждого рецепта есть строка оценки (сортировка читает таблицы
+    через INNER JOIN): недостающие строки создаются нулевыми, прежние
+    ненулевые оценки обнуляются, новые записываются поверх. Меняются
+    только строки рецептов с оценками, всё в одной транзакции, поэтому
+    чтение сортировки не видит промежуточного состояния.
+
+    Возвращает число рецептов с ненулевой оценкой.
+    """
+    now = now or timezone.now()
+    popular = _decayed_scores(
+        now - timedelta(days=settings.RECIPE_SCORE_WINDOW_DAYS), now,
+        TruncDay, settings.RECIPE_SCORE_POPULAR_HALF_LIFE * 24 * 3600,
+    )
+    trending = _decayed_scores(
+        now - timedelta(hours=settings.RECIPE_SCORE_TRENDING_WINDOW_HOURS),
+        now, TruncHour, settings.RECIPE_SCORE_TRENDING_HALF_LIFE * 3600,
+    )
+    scores = [
+        RecipeScore(recipe_id=recipe_id,
+                    popular=max(popular.get(recipe_id, 0), 0),
+                    trending=max(trending.get(recipe_id, 0), 0))
+        for recipe_id in popular.keys() | trending.keys()
+    ]
+    scores = [score for score in scores if score.popular or score.trending]
+    for score in scores:
+        score.updated = now
+    with transaction.atomic():
+        RecipeScore.objects.bulk_create(
+            (RecipeScore(recipe_id=pk) for pk in Recipe.objects.filter(
+                score__isnull=True).values_list('pk', flat=True)),
+            batch_size=1000, ignore_conflicts=True,
+        )
+        RecipeScore.objects.filter(
+            Q(popular__gt=0) | Q(trending__gt=0)
+        ).update(popular=0, trending=0, updated=now)
+        RecipeScore.objects.bulk_update(
+            scores, ('popular', 'trending', 'updated'), batch_size=1000
+        )
+    return len(scores)
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens
+from api.cache import invalidate_responses
+from api.documents import refresh_recipe_documents
+from api.indexes import notify_recipe_changed
+from recipes.models import Ingredient, Recipe, RecipeScore, Tag
+
+User = get_user_model()
+
+# Поля пользователя, попадающие в документы рецептов как автор
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Сбрасывает кэш аутентификации при удалении токена (token/logout)."""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Сбрасывает кэш аутентификации при изменении пользователя."""
+    if created:
+        return
+    keys = list(Token.objects.filter(user=instance)
+                .values_list('key', flat=True))
+    if keys:
+        invalidate_tokens(*keys)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    """Создаёт нулевую оценку, чтобы рецепт попал в сортировку."""
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_deleted_recipe(sender, instance, **kwargs):
+    """Убирает удалённый рецепт из индексов рецептов."""
+    notify_recipe_changed(instance.id)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_responses(sender, **kwargs):
+    """Сбрасывает кэш ответов со списком ингредиентов."""
+    invalidate_responses('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_responses(sender, **kwargs):
+    """Сбрасывает кэш ответов со списком тегов."""
+    invalidate_responses('tags')
+
+
+@receiver(post_save, sender=User)
+def refresh_author_documents(sender, instance, created, update_fields,
+                             **kwargs):
+    """Пересобирает документы рецептов автора при изменении профиля."""
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    if Recipe.objects.filter(author=instance).exists():
+        refresh_recipe_documents.delay(author=instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def refresh_tag_documents(sender, instance, created, **kwargs):
+    """Пересобирает документы рецептов с изменённым тегом."""
+    if not created:
+        refresh_recipe_documents.delay(tags=instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_documents(sender, instance, created, **kwargs):
+    """Пересобирает документы рецептов с изменённым ингредиентом."""
+    if not created:
+        refresh_recipe_documents.delay(
+            recipeingredients__ingredient=instance.pk
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def refresh_deleted_relation_documents(sender, instance, **kwargs):
+    """
+    Пересобирает документы рецептов, теряющих тег или ингредиент.
+
+    Связи удаляются вместе с объектом, поэтому рецепты выбираются
+    до удаления.
+    """
+    lookup = ({'tags': instance.pk} if sender is Tag
+              else {'recipeingredients__ingredient': instance.pk})
+    pks = list(Recipe.objects.filter(**lookup)
+               .values_list('pk', flat=True).distinct())
+    if pks:
+        refresh_recipe_documents.delay(pk__in=pks)
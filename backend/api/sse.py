@@ -0,0 +1,181 @@
+"""
+Поток server-sent events о новых рецептах авторов из подписок.
+
+GET /api/recipes/events/ под ASGI обслуживается отдельным ASGI-приложением
+в обход Django: Django 3.2 не умеет асинхронные потоковые ответы, а
+синхронный поток занимал бы поток воркера на всё время соединения.
+Соединение - это подписка в хабе api.events и одна корутина, поэтому
+опрос subscriptions для поиска новых рецептов больше не нужен.
+
+Аутентификация - токен в заголовке Authorization: Token <ключ> или,
+для EventSource в браузере, одноразовый билет в параметре ticket.
+Билет выдаёт POST /api/recipes/events/ticket/ (issue_ticket), он живёт
+EVENTS_TICKET_TTL секунд. Постоянный токен в строку запроса не
+передаётся: она попадает в журналы nginx. Подписки читаются при
+подключении. Соединение закрывается после EVENTS_IDLE_TIMEOUT секунд
+без событий или при переполнении очереди, клиент переподключается
+(с новым билетом) и заново читает подписки.
+
+События:
+    event: recipe
+    id: <id рецепта>
+    data: <RecipeShortSerializer и author - id автора>
+"""
+import asyncio
+import json
+import secrets
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication
+from api.events import hub
+from users.models import Follow
+
+EVENTS_PATH = '/api/recipes/events/'
+TICKET_KEY = 'stream-ticket:{}'
+KEEPALIVE = b': keepalive\n\n'
+OVERFLOW = b'event: overflow\ndata: {}\n\n'
+
+
+def issue_ticket(user):
+    """Выдаёт одноразовый билет на подключение к потоку событий."""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(TICKET_KEY.format(ticket), user.pk, settings.EVENTS_TICKET_TTL)
+    return ticket
+
+
+def redeem_ticket(ticket):
+    """Погашает билет, возвращает id пользователя или None."""
+    key = TICKET_KEY.format(ticket)
+    user_id = cache.get(key)
+    # Билет достаётся тому подключению, которое первым его удалило.
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
+
+
+def _get_credentials(scope):
+    """Токен из заголовка Authorization и билет из строки запроса."""
+    headers = dict(scope['headers'])
+    keyword, _, key = headers.get(b'authorization', b'').decode().partition(
+        ' ')
+    token = key.strip() if keyword == 'Token' else ''
+    query = parse_qs(scope.get('query_string', b'').decode())
+    return token or None, query.get('ticket', [None])[0]
+
+
+def _get_authors(token, ticket):
+    """Авторы из подписок пользователя или None без аутентификации."""
+    close_old_connections()
+    try:
+        if token:
+            user_id = CachedTokenAuthentication().authenticate_credentials(
+                token)[0].pk
+        else:
+            user_id = redeem_ticket(ticket)
+        if user_id is None:
+            return None
+        return list(Follow.objects.filter(user_id=user_id)
+                    .values_list('author_id', flat=True))
+    except AuthenticationFailed:
+        return None
+    finally:
+        close_old_connections()
+
+
+def _format_event(event):
+    data = dict(event['recipe'], author=event['author'])
+    return (f'event: recipe\nid: {data["id"]}\n'
+            f'data: {json.dumps(data, ensure_ascii=False)}\n\n').encode()
+
+
+async def _respond(send, status, data):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body',
+                'body': json.dumps(data, ensure_ascii=False).encode()})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def recipe_events(scope, receive, send):
+    """ASGI-приложение потока событий для одного соединения."""
+    if scope['method'] != 'GET':
+        await _respond(send, 405, {'detail': 'Метод не разрешен.'})
+        return
+    token, ticket = _get_credentials(scope)
+    authors = None
+    if token or ticket:
+        authors = await sync_to_async(_get_authors,
+                                      thread_sensitive=False)(token, ticket)
+    if authors is None:
+        await _respond(send, 401, {
+            'detail': 'Учетные данные не были предоставлены.'})
+        return
+    subscription = hub.subscribe(authors)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+    loop = asyncio.get_running_loop()
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                # nginx не должен буферизовать поток.
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': f'retry: {settings.EVENTS_RETRY}\n\n'.encode()})
+        last_event = loop.time()
+        while True:
+            get = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {get, disconnect}, timeout=settings.EVENTS_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                get.cancel()
+                return
+            if get in done:
+                event = get.result()
+                if event is None:
+                    await send({'type': 'http.response.body',
+                                'body': OVERFLOW, 'more_body': True})
+                    break
+                chunk = _format_event(event)
+                last_event = loop.time()
+            else:
+                get.cancel()
+                if loop.time() - last_event >= settings.EVENTS_IDLE_TIMEOUT:
+                    break
+                chunk = KEEPALIVE
+            await send({'type': 'http.response.body', 'body': chunk,
+                        'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        hub.unsubscribe(subscription)
+        disconnect.cancel()
+
+
+def with_recipe_events(application):
+    """Направляет EVENTS_PATH в поток событий, остальное - в application."""
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+            return await recipe_events(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return router
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+
+class APIDataTestCase(APITestCase):
+    """Пользователи, теги, ингредиенты и рецепты для тестов API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(
+            email='alice@example.com', username='alice',
+            first_name='Alice', last_name='A', password='pw12345xx',
+        )
+        cls.bob = User.objects.create_user(
+            email='bob@example.com', username='bob',
+            first_name='Bob', last_name='B', password='pw12345xx',
+        )
+        cls.breakfast = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                           slug='breakfast')
+        cls.flour_g = Ingredient.objects.create(name='мука',
+                                                measurement_unit='г')
+        cls.flour_kg = Ingredient.objects.create(name='мука',
+                                                 measurement_unit='кг')
+        cls.milk_l = Ingredient.objects.create(name='молоко',
+                                               measurement_unit='л')
+        cls.egg = Ingredient.objects.create(name='яйцо',
+                                            measurement_unit='шт.')
+        cls.pancakes = cls.create_recipe(
+            cls.alice, 'Блины',
+            [(cls.flour_g, 300), (cls.milk_l, 1), (cls.egg, 2)],
+        )
+        cls.bread = cls.create_recipe(
+            cls.bob, 'Хлеб', [(cls.flour_kg, 1)],
+        )
+
+    @classmethod
+    def create_recipe(cls, author, name, ingredients):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text='Текст', cooking_time=10,
+            image='recipes/test.png',
+        )
+        recipe.tags.add(cls.breakfast)
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                              amount=amount)
+            for ingredient, amount in ingredients
+        )
+        return recipe
+
+    def setUp(self):
+        # Счётчики лимитов и кэш ответов не переходят между тестами.
+        cache.clear()
+        self.client.force_authenticate(self.alice)
@@ -0,0 +1,103 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from rest_framework import status
+
+from api.documents import build_documents
+from api.tests.base import APIDataTestCase
+from recipes.models import Favourite, Recipe, RecipeDocument
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+class RecipeBatchTests(APIDataTestCase):
+    """Получение нескольких рецептов по списку идентификаторов."""
+
+    def test_order_and_missing(self):
+        Favourite.objects.create(user=self.alice, recipe=self.bread)
+        response = self.client.get(
+            f'/api/recipes/batch/?ids={self.bread.pk},999,{self.pancakes.pk}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.bread.pk, self.pancakes.pk],
+        )
+        self.assertEqual(response.data['missing'], [999])
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+        self.assertFalse(response.data['results'][1]['is_favorited'])
+
+    def test_fields(self):
+        response = self.client.get(
+            f'/api/recipes/batch/?ids={self.bread.pk}&fields=id,name'
+        )
+        self.assertEqual(response.data['results'],
+                         [{'id': self.bread.pk, 'name': 'Хлеб'}])
+
+    def test_validation(self):
+        too_many = ','.join(map(str, range(1, settings.BULK_IDS_MAX + 2)))
+        for ids in ('', 'a,b', too_many):
+            with self.subTest(ids=ids):
+                response = self.client.get(f'/api/recipes/batch/?ids={ids}')
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeDocumentTests(APIDataTestCase):
+    """Готовые документы рецептов в списке и карточке."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_read_your_writes(self):
+        data = {
+            'name': 'Омлет', 'text': 'Текст', 'cooking_time': 5,
+            'image': IMAGE, 'tags': [self.breakfast.pk],
+            'ingredients': [{'id': self.egg.pk, 'amount': 3}],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        pk = response.data['id']
+        self.assertEqual(RecipeDocument.objects.get(recipe=pk).data['name'],
+                         'Омлет')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/recipes/{pk}/',
+                              dict(data, name='Яичница'), format='json')
+        self.assertEqual(self.client.get(f'/api/recipes/{pk}/').data['name'],
+                         'Яичница')
+
+    def test_document_matches_serializer(self):
+        Favourite.objects.create(user=self.alice, recipe=self.bread)
+        without_documents = self.client.get('/api/recipes/').data
+        retrieve = self.client.get(f'/api/recipes/{self.bread.pk}/').data
+        build_documents(Recipe.objects.all())
+        self.assertEqual(self.client.get('/api/recipes/').data,
+                         without_documents)
+        response = self.client.get(f'/api/recipes/{self.bread.pk}/')
+        self.assertEqual(response.data, retrieve)
+        self.assertTrue(retrieve['is_favorited'])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_tag_change_rebuilds_documents(self):
+        build_documents(Recipe.objects.all())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.breakfast.name = 'Утро'
+            self.breakfast.save()
+        for document in RecipeDocument.objects.all():
+            self.assertEqual(document.data['tags'][0]['name'], 'Утро')
@@ -0,0 +1,127 @@
+from django.conf import settings
+from rest_framework import status
+
+from api.tests.base import APIDataTestCase
+from recipes.models import Favourite, ShoppingCart
+from users.models import Follow
+
+
+class RecipeRelationTests(APIDataTestCase):
+    """Избранное и список покупок: по одному рецепту и пакетом."""
+
+    def test_favorite_toggle(self):
+        url = f'/api/recipes/{self.bread.pk}/favorite/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['id'], self.bread.pk)
+        self.assertTrue(response.data['image'].startswith('http://'))
+        self.assertEqual(self.client.post(url).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.delete(url).status_code,
+                         status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(url).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Favourite.objects.exists())
+
+    def test_favorite_missing_recipe(self):
+        response = self.client.post('/api/recipes/0/favorite/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            f'/api/recipes/{self.bread.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_favorite_bulk(self):
+        Favourite.objects.create(user=self.alice, recipe=self.bread)
+        response = self.client.post(
+            '/api/recipes/favorite/bulk/',
+            {'ids': [self.bread.pk, self.pancakes.pk, self.bread.pk, 999]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'id': self.bread.pk, 'status': 'exists'},
+            {'id': self.pancakes.pk, 'status': 'added'},
+            {'id': 999, 'status': 'not_found'},
+        ])
+        response = self.client.delete(
+            '/api/recipes/favorite/bulk/',
+            {'ids': [self.pancakes.pk, 999]}, format='json',
+        )
+        self.assertEqual(response.data['results'], [
+            {'id': self.pancakes.pk, 'status': 'removed'},
+            {'id': 999, 'status': 'not_found'},
+        ])
+        self.assertEqual(
+            list(Favourite.objects.values_list('recipe', flat=True)),
+            [self.bread.pk],
+        )
+
+    def test_bulk_validation(self):
+        too_many = list(range(1, settings.BULK_IDS_MAX + 2))
+        for data in ({'ids': []}, {'ids': [0]}, {'ids': too_many}):
+            with self.subTest(data=data):
+                response = self.client.post(
+                    '/api/recipes/shopping_cart/bulk/', data, format='json'
+                )
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_shopping_cart_bulk_remove(self):
+        ShoppingCart.objects.create(user=self.alice, recipe=self.bread)
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/bulk/',
+            {'ids': [self.bread.pk, self.pancakes.pk]}, format='json',
+        )
+        self.assertEqual(response.data['results'], [
+            {'id': self.bread.pk, 'status': 'removed'},
+            {'id': self.pancakes.pk, 'status': 'missing'},
+        ])
+        self.assertFalse(ShoppingCart.objects.exists())
+
+    def test_shopping_cart_contents(self):
+        ShoppingCart.objects.create(user=self.alice, recipe=self.bread)
+        ShoppingCart.objects.create(user=self.bob, recipe=self.bread)
+        response = self.client.put(
+            '/api/recipes/shopping_cart/',
+            {'ids': [self.pancakes.pk]}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['recipes'][0]['id'], self.pancakes.pk)
+        response = self.client.put(
+            '/api/recipes/shopping_cart/', {'ids': [999]}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['ids'], [999])
+        response = self.client.delete('/api/recipes/shopping_cart/')
+        self.assertEqual(response.data, {'count': 0, 'recipes': []})
+        # Список другого пользователя не затронут.
+        self.assertTrue(ShoppingCart.objects.filter(user=self.bob).exists())
+
+
+class SubscriptionBulkTests(APIDataTestCase):
+    """Пакетная подписка на авторов."""
+
+    def test_subscribe_bulk(self):
+        response = self.client.post(
+            '/api/users/subscribe/bulk/',
+            {'ids': [self.alice.pk, self.bob.pk, 999]}, format='json',
+        )
+        self.assertEqual(response.data['results'], [
+            {'id': self.alice.pk, 'status': 'forbidden'},
+            {'id': self.bob.pk, 'status': 'added'},
+            {'id': 999, 'status': 'not_found'},
+        ])
+        self.assertTrue(
+            Follow.objects.filter(user=self.alice, author=self.bob).exists()
+        )
+        response = self.client.delete(
+            '/api/users/subscribe/bulk/', {'ids': [self.bob.pk]},
+            format='json',
+        )
+        self.assertEqual(response.data['results'],
+                         [{'id': self.bob.pk, 'status': 'removed'}])
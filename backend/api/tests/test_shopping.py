@@ -0,0 +1,118 @@
+from rest_framework import status
+
+from api.tests.base import APIDataTestCase
+from recipes.models import PantryItem, ShoppingCart
+
+
+class PantryTests(APIDataTestCase):
+    """Запасы пользователя."""
+
+    def test_edit(self):
+        response = self.client.put('/api/pantry/', {'items': [
+            {'id': self.flour_kg.pk, 'amount': 2},
+            {'id': self.egg.pk, 'amount': 10},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {item['id']: item['amount'] for item in response.data},
+            {self.flour_kg.pk: 2, self.egg.pk: 10},
+        )
+        response = self.client.patch('/api/pantry/', {'items': [
+            {'id': self.flour_kg.pk, 'amount': 0},
+            {'id': self.milk_l.pk, 'amount': 1},
+        ]}, format='json')
+        self.assertEqual(
+            {item['id']: item['amount'] for item in response.data},
+            {self.egg.pk: 10, self.milk_l.pk: 1},
+        )
+        response = self.client.delete('/api/pantry/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(PantryItem.objects.exists())
+
+    def test_missing_ingredient(self):
+        response = self.client.put(
+            '/api/pantry/', {'items': [{'id': 999, 'amount': 1}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PantryItem.objects.exists())
+
+    def test_pantry_is_private(self):
+        PantryItem.objects.create(user=self.bob, ingredient=self.egg,
+                                  amount=1)
+        self.assertEqual(self.client.get('/api/pantry/').data, [])
+
+
+class ShoppingListTests(APIDataTestCase):
+    """Список покупок по набору рецептов и скачивание списка покупок."""
+
+    def shopping_list(self):
+        return self.client.post('/api/recipes/shopping_list/', {'recipes': [
+            {'id': self.pancakes.pk, 'servings': 2},
+            {'id': self.bread.pk},
+            {'id': 999},
+        ]}, format='json')
+
+    def test_servings_and_units(self):
+        response = self.shopping_list()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'name': 'молоко', 'measurement_unit': 'л', 'amount': '2'},
+            {'name': 'мука', 'measurement_unit': 'кг', 'amount': '1.6'},
+            {'name': 'яйцо', 'measurement_unit': 'шт.', 'amount': '4'},
+        ])
+
+    def test_pantry_is_subtracted(self):
+        PantryItem.objects.bulk_create([
+            PantryItem(user=self.alice, ingredient=self.flour_g, amount=600),
+            PantryItem(user=self.alice, ingredient=self.egg, amount=5),
+            PantryItem(user=self.bob, ingredient=self.milk_l, amount=5),
+        ])
+        self.assertEqual(self.shopping_list().data, [
+            {'name': 'молоко', 'measurement_unit': 'л', 'amount': '2'},
+            {'name': 'мука', 'measurement_unit': 'кг', 'amount': '1'},
+        ])
+
+    def test_repeated_recipe_servings_add_up(self):
+        response = self.client.post('/api/recipes/shopping_list/', {
+            'recipes': [{'id': self.bread.pk}, {'id': self.bread.pk,
+                                                'servings': '0.5'}],
+        }, format='json')
+        self.assertEqual(response.data, [
+            {'name': 'мука', 'measurement_unit': 'кг', 'amount': '1.5'},
+        ])
+
+    def test_file(self):
+        response = self.client.post(
+            '/api/recipes/shopping_list/?file_format=csv',
+            {'recipes': [{'id': self.bread.pk}]}, format='json',
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=UTF-8')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['name,measurement_unit,amount', 'мука,кг,1'],
+        )
+
+    def test_download_shopping_cart(self):
+        ShoppingCart.objects.create(user=self.alice, recipe=self.pancakes)
+        ShoppingCart.objects.create(user=self.alice, recipe=self.bread)
+        ShoppingCart.objects.create(user=self.bob, recipe=self.bread)
+        PantryItem.objects.create(user=self.alice, ingredient=self.milk_l,
+                                  amount=1)
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?file_format=csv'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['name,measurement_unit,amount', 'мука,кг,1.3', 'яйцо,шт.,2'],
+        )
+
+    def test_validation(self):
+        for data in ({'recipes': []},
+                     {'recipes': [{'id': self.bread.pk, 'servings': 0}]}):
+            with self.subTest(data=data):
+                response = self.client.post('/api/recipes/shopping_list/',
+                                            data, format='json')
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
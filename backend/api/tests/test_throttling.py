@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+from api.throttling import ActionRateThrottle
+
+RATES = {'test': '3/min', 'closed': '0/min'}
+
+
+@mock.patch.object(ActionRateThrottle, 'THROTTLE_RATES', RATES)
+class ActionRateThrottleTests(SimpleTestCase):
+    """Скользящее окно ActionRateThrottle."""
+
+    def setUp(self):
+        cache.clear()
+        self.now = 600.0
+        self.view = SimpleNamespace(action='create',
+                                    throttle_scopes={'create': 'test'})
+
+    def request(self, method='post'):
+        request = getattr(APIRequestFactory(), method)('/')
+        request.user = AnonymousUser()
+        return request
+
+    def throttle(self, method='post'):
+        throttle = ActionRateThrottle()
+        throttle.timer = lambda: self.now
+        return throttle, throttle.allow_request(self.request(method),
+                                                self.view)
+
+    def test_limit_in_window(self):
+        for _ in range(3):
+            self.assertTrue(self.throttle()[1])
+        throttle, allowed = self.throttle()
+        self.assertFalse(allowed)
+        # Следующее окно, и ещё треть его, пока вес предыдущего не
+        # опустится до двух запросов.
+        self.assertAlmostEqual(throttle.wait(), 80)
+
+    def test_rejected_request_is_not_counted(self):
+        for _ in range(5):
+            self.throttle()
+        self.assertEqual(self.throttle()[0].current, 3)
+
+    def test_previous_window_is_weighted(self):
+        for _ in range(3):
+            self.throttle()
+        # В начале нового окна предыдущее учитывается целиком.
+        self.now += 60
+        throttle, allowed = self.throttle()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 20)
+        # Через треть окна от предыдущего остаётся два запроса.
+        self.now += 20
+        self.assertTrue(self.throttle()[1])
+        self.assertFalse(self.throttle()[1])
+
+    def test_wait_is_enough(self):
+        for _ in range(3):
+            self.throttle()
+        self.now += 80
+        self.assertTrue(self.throttle()[1])
+        throttle, allowed = self.throttle()
+        self.assertFalse(allowed)
+        self.now += throttle.wait()
+        self.assertTrue(self.throttle()[1])
+
+    def test_zero_rate(self):
+        self.view.throttle_scopes = {'create': 'closed'}
+        throttle, allowed = self.throttle()
+        self.assertFalse(allowed)
+        self.assertIsNone(throttle.wait())
+
+    def test_action_without_scope(self):
+        self.view.action = 'list'
+        self.assertTrue(self.throttle()[1])
+
+    def test_scope_by_method(self):
+        self.view.throttle_scopes = {'create': {'PUT': 'closed'}}
+        self.assertTrue(self.throttle('get')[1])
+        self.assertFalse(self.throttle('put')[1])
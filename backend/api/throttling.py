@@ -0,0 +1,162 @@
+"""
+Ограничение частоты запросов к дорогим действиям API.
+
+ActionRateThrottle берёт область (scope) по имени действия ViewSet'а из
+его атрибута throttle_scopes (для действия с несколькими методами - из
+словаря {метод: область}), частоты областей задаются в
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. Лимит считается отдельно для
+каждого пользователя (анонимов - по IP) и области.
+
+Используется скользящее окно: счётчики текущего и предыдущего
+фиксированных окон хранятся в общем кэше и увеличиваются атомарно
+через cache.add/cache.incr, поэтому лимит общий для всех воркеров.
+Запрос разрешается, если сумма текущего счётчика и доли предыдущего,
+ещё попадающей в окно, не превышает лимит. При недоступности общего
+кэша счётчики ведутся в памяти процесса - для одного узла лимит
+остаётся точным. Отказ возвращает 429 с заголовком Retry-After
+(кроме частоты 0/..., которая закрывает область совсем).
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEY = 'throttle:{}:{}:{}'
+
+
+class LocalCounters:
+    """Счётчики окон в памяти процесса с истечением по времени."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        for key in [key for key, (expires_at, _) in self._data.items()
+                    if expires_at < now]:
+            del self._data[key]
+
+    def incr(self, key, delta, timeout):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) > 10000:
+                self._purge(now)
+            expires_at, value = self._data.get(key, (now + timeout, 0))
+            if expires_at < now:
+                expires_at, value = now + timeout, 0
+            self._data[key] = (expires_at, value + delta)
+            return value + delta
+
+    def get(self, key):
+        with self._lock:
+            expires_at, value = self._data.get(key, (0, 0))
+            return value if expires_at >= time.monotonic() else 0
+
+
+local_counters = LocalCounters()
+
+
+def _incr(key, delta, timeout):
+    try:
+        cache.add(key, 0, timeout)
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            # Ключ вытеснен между add и incr.
+            cache.set(key, max(delta, 0), timeout)
+            return max(delta, 0)
+    except Exception:
+        logger.warning('Общий кэш недоступен, лимиты считаются в процессе',
+                       exc_info=True)
+        return local_counters.incr(key, delta, timeout)
+
+
+def _get(key):
+    try:
+        return cache.get(key, 0)
+    except Exception:
+        return local_counters.get(key)
+
+
+class ActionRateThrottle(SimpleRateThrottle):
+    """
+    Лимит частоты по действию ViewSet'а со скользящим окном.
+
+    Пример настройки представления:
+        throttle_classes = (ActionRateThrottle,)
+        throttle_scopes = {
+            'create': 'recipe_write',
+            'contents': {'PUT': 'toggle', 'DELETE': 'toggle'},
+        }
+    Действия и методы без области не ограничиваются.
+    """
+
+    def __init__(self):
+        # Частота зависит от действия и определяется в allow_request.
+        pass
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'{self.scope}:{ident}'
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None)
+        )
+        if isinstance(scope, dict):
+            return scope.get(request.method)
+        return scope
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        if self.scope is None:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+        if not self.num_requests:
+            return False
+        key = self.get_cache_key(request, view)
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        current_key = COUNTER_KEY.format(key, self.duration, window)
+        # Счётчик окна живёт ещё одно окно, пока он предыдущий.
+        self.current = _incr(current_key, 1, 2 * self.duration)
+        self.previous = _get(COUNTER_KEY.format(key, self.duration,
+                                                window - 1))
+        if self._estimate(0, self.current) <= self.num_requests:
+            return True
+        # Отклонённый запрос не расходует лимит.
+        self.current = _incr(current_key, -1, 2 * self.duration)
+        return False
+
+    def _estimate(self, delay, current):
+        """Оценка числа запросов в окне через delay секунд."""
+        weight = max(self.duration - self.elapsed - delay, 0) / self.duration
+        return self.previous * weight + current
+
+    def wait(self):
+        """Секунды до освобождения места в окне для одного запроса."""
+        if not self.num_requests:
+            # Частота 0 не пропускает запросов, ждать нечего.
+            return None
+        excess = self._estimate(0, self.current) + 1 - self.num_requests
+        remaining = self.duration - self.elapsed
+        if self.previous and self.previous * remaining / self.duration >= (
+                excess):
+            # Хватит того, что предыдущее окно сдвинется дальше.
+            return excess * self.duration / self.previous
+        # Ждём следующего окна, где текущий счётчик станет предыдущим.
+        excess = self.current + 1 - self.num_requests
+        if excess <= 0:
+            return remaining
+        return remaining + excess * self.duration / self.current
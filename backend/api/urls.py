@@ -12,6 +12,9 @@ URL-маршруты включают следующие конечные точ
 - 'ingredients': Просмотр, создание, обновление и удаление ингредиентов.
 - 'recipes': Просмотр, создание, обновление и удаление рецептов.
 
+- 'pantry': Просмотр и пакетное изменение запасов пользователя.
+- 'instrumentation': Статистика воркера для администраторов.
+
 URL-маршруты также включают конечную точку 'auth' для обработки аутентификации,
 которая использует URL-маршруты из пакета 'djoser.urls.authtoken'.
 """
@@ -19,8 +22,8 @@ URL-маршруты также включают конечную точку 'au
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (IngredientViewSet, MeUserViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.views import (IngredientViewSet, InstrumentationView, MeUserViewSet,
+                       PantryView, RecipeViewSet, TagViewSet)
 
 router = DefaultRouter()
 app_name = 'api'
@@ -31,6 +34,9 @@ router.register('ingredients', IngredientViewSet)
 router.register('recipes', RecipeViewSet)
 
 urlpatterns = [
+    path('pantry/', PantryView.as_view(), name='pantry'),
+    path('instrumentation/', InstrumentationView.as_view(),
+         name='instrumentation'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
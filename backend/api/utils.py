@@ -1,5 +1,6 @@
 """
-Модуль, содержащий представление для скачивания списка покупок.
+Модуль, содержащий представление для скачивания списка покупок
+и общий построитель сводного списка ингредиентов.
 
 Модуль определяет представление 'download_cart', которое отвечает на запрос
 скачивания списка покупок в виде текстового файла.
@@ -9,38 +10,226 @@
 связанных с рецептами,
   находящимися в списке покупок пользователя,
    сгруппированных по названию ингредиента
-  и единице измерения.
+  и единице измерения, приведённой к канонической (кг -> г, л -> мл).
+  Перевод единиц и суммирование выполняются в БД одним GROUP BY,
+  запасы пользователя (PantryItem) вычитаются в том же запросе.
 - Формирует текстовое представление списка покупок,
 включая название ингредиента,
-  единицу измерения и общее количество.
-- Возвращает HTTP-ответ с текстом списка покупок в формате 'text/plain',
+  единицу измерения в удобном виде и общее количество.
+- Возвращает потоковый HTTP-ответ со списком покупок в формате
+'text/plain' (file_format=txt) или 'text/csv' (file_format=csv),
 с заданными  заголовками и именем файла.
 
+Функции 'shopping_list_queryset' и 'shopping_list_response' используются
+также для списка покупок по произвольному набору рецептов с учётом
+числа порций.
+
 """
+import csv
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import (Case, CharField, DecimalField, F, IntegerField,
+                              Value, When)
 from django.db.models.aggregates import Sum
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
 
-from api.serializers import RecipeIngredients
+from recipes.models import PantryItem, RecipeIngredients
 
+# Единицы из data/ingredients.csv, которые сводятся друг к другу:
+# единица -> (каноническая единица, множитель).
+# Остальные единицы (шт., ст. л., по вкусу...) суммируются как есть.
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+}
 
-def download_cart(request):
-    ingredients = (
-        RecipeIngredients.objects.filter(
-            recipe__shopping_cart__user=request.user
+# Единицы для вывода: каноническая единица -> [(единица, множитель)]
+# по убыванию множителя.
+DISPLAY_UNITS = {}
+for _unit, (_canonical, _factor) in UNIT_CONVERSIONS.items():
+    DISPLAY_UNITS.setdefault(_canonical, []).append((_unit, _factor))
+for _units in DISPLAY_UNITS.values():
+    _units.sort(key=lambda item: item[1], reverse=True)
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': 'text/plain; charset=UTF-8',
+    'csv': 'text/csv; charset=UTF-8',
+}
+
+
+def _unit_annotations():
+    """
+    Выражения канонической единицы и множителя для поля
+    ingredient__measurement_unit.
+    """
+    converted = [
+        (unit, canonical, factor)
+        for unit, (canonical, factor) in UNIT_CONVERSIONS.items()
+        if unit != canonical
+    ]
+    multiplier = Case(
+        *(When(ingredient__measurement_unit=unit, then=Value(factor))
+          for unit, _, factor in converted),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    canonical_unit = Case(
+        *(When(ingredient__measurement_unit=unit, then=Value(canonical))
+          for unit, canonical, _ in converted),
+        default=F('ingredient__measurement_unit'),
+        output_field=CharField(),
+    )
+    return canonical_unit, multiplier
+
+
+def shopping_list_queryset(queryset, servings=None):
+    """
+    Сводный список ингредиентов в канонических единицах.
+
+    queryset - набор RecipeIngredients или PantryItem,
+    из которого строится список.
+    servings - необязательный словарь {id рецепта: число порций},
+    количества умножаются на него в том же агрегирующем запросе.
+
+    Возвращает values-набор с полями name, unit и amount,
+    сгруппированный по названию и канонической единице.
+    """
+    canonical_unit, multiplier = _unit_annotations()
+    amount = F('amount') * multiplier
+    if servings:
+        amount = amount * Case(
+            *(When(recipe_id=recipe_id, then=Value(count))
+              for recipe_id, count in servings.items()),
+            default=Value(0),
+            output_field=DecimalField(max_digits=8, decimal_places=2),
         )
-        .values("ingredient__name", "ingredient__measurement_unit")
-        .annotate(amount=Sum("amount"))
+    return (
+        queryset.annotate(name=F('ingredient__name'), unit=canonical_unit)
+        .values('name', 'unit')
+        .annotate(amount=Sum(amount))
+        .order_by('name', 'unit')
+    )
+
+
+def subtract_pantry(ingredients, user):
+    """
+    Вычитает запасы пользователя из сводного списка ингредиентов.
+
+    ingredients - результат shopping_list_queryset.
+
+    Список и запасы агрегируются в БД и соединяются LEFT JOIN по названию
+    и канонической единице в одном запросе. Позиции, которые полностью
+    покрыты запасами, в результат не попадают.
+
+    Возвращает список словарей с полями name, unit и amount. Строки
+    читаются сразу: под ASGI потоковый ответ перебирается в event loop,
+    где обращаться к БД нельзя.
+    """
+    cart_sql, cart_params = ingredients.order_by().query.sql_with_params()
+    pantry_sql, pantry_params = shopping_list_queryset(
+        PantryItem.objects.filter(user=user)
+    ).order_by().query.sql_with_params()
+    sql = (
+        f'SELECT cart.name, cart.unit, '
+        f'cart.amount - COALESCE(pantry.amount, 0) AS amount '
+        f'FROM ({cart_sql}) cart '
+        f'LEFT JOIN ({pantry_sql}) pantry '
+        f'ON pantry.name = cart.name AND pantry.unit = cart.unit '
+        # Покрытые запасами позиции отбрасываются, а не обнуляются
+        # через GREATEST: строка с количеством 0 в списке не нужна.
+        f'WHERE cart.amount > COALESCE(pantry.amount, 0) '
+        f'ORDER BY cart.name, cart.unit'
     )
+    with connections[ingredients.db].cursor() as cursor:
+        cursor.execute(sql, (*cart_params, *pantry_params))
+        rows = cursor.fetchall()
+    return [{'name': name, 'unit': unit, 'amount': amount}
+            for name, unit, amount in rows]
 
-    text = ""
+
+def humanize_amount(amount, unit):
+    """
+    Переводит количество в канонической единице в удобную для чтения.
+
+    Например, (1500, 'г') -> ('1.5', 'кг').
+    """
+    value = Decimal(amount)
+    for display_unit, factor in DISPLAY_UNITS.get(unit, ()):
+        if value >= factor:
+            value /= factor
+            unit = display_unit
+            break
+    return format(value.normalize(), 'f'), unit
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def _txt_lines(ingredients):
     for ingredient in ingredients:
-        text += (
-            f'•  {ingredient["ingredient__name"]}'
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f'— {ingredient["amount"]}\n'
+        amount, unit = humanize_amount(ingredient["amount"],
+                                       ingredient["unit"])
+        yield (
+            f'•  {ingredient["name"]}'
+            f'({unit})'
+            f'— {amount}\n'
         )
-    headers = {"Content-Disposition": "attachment; filename=shopping_cart.txt"}
-    return HttpResponse(
-        text,
-        content_type="text/plain; charset=UTF-8",
+
+
+def _csv_lines(ingredients):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for ingredient in ingredients:
+        amount, unit = humanize_amount(ingredient["amount"],
+                                       ingredient["unit"])
+        yield writer.writerow((ingredient["name"], unit, amount))
+
+
+def shopping_list_response(ingredients, file_format, filename):
+    """
+    Потоковый ответ со списком покупок в формате txt или csv.
+
+    ingredients - результат subtract_pantry. Строки загружаются до ответа,
+    потоком отдаётся только их форматирование: под ASGI Django 3.2
+    перебирает потоковый ответ в event loop, и ленивый запрос к БД
+    упал бы с SynchronousOnlyOperation.
+    """
+    if file_format not in SHOPPING_LIST_FORMATS:
+        raise ValidationError(
+            {"file_format": f"Допустимые форматы: "
+                            f"{', '.join(SHOPPING_LIST_FORMATS)}"}
+        )
+    lines = _txt_lines if file_format == "txt" else _csv_lines
+    headers = {
+        "Content-Disposition":
+            f"attachment; filename={filename}.{file_format}"
+    }
+    return StreamingHttpResponse(
+        lines(list(ingredients)),
+        content_type=SHOPPING_LIST_FORMATS[file_format],
         headers=headers)
+
+
+def download_cart(request):
+    ingredients = subtract_pantry(
+        shopping_list_queryset(
+            RecipeIngredients.objects.filter(
+                recipe__shopping_cart__user=request.user
+            )
+        ),
+        request.user,
+    )
+    return shopping_list_response(
+        ingredients,
+        request.query_params.get("file_format", "txt"),
+        "shopping_cart",
+    )
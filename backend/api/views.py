@@ -1,24 +1,85 @@
-from django.shortcuts import get_object_or_404
+import os
+
+from django.conf import settings
+from django.db.models import (Count, OuterRef, Prefetch, Subquery,
+                              prefetch_related_objects)
+from django.db.models.functions import Coalesce
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.exceptions import MethodNotAllowed, ValidationError
+from rest_framework.filters import SearchFilter
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from api.cache import cache_response, get_cache_stats
+from api.documents import build_documents_on_commit
 from api.filters import NameSearchFilter, RecipeFilter
-from api.pagination import CustumPagination
+from api.indexes import cookable_index, get_similar_recipes
+from api.pagination import EstimatedCountPagination
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from api.serializers import (FollowSerializer, IngredientSerializer,
-                             MyUserSerializer, RecipeCreateSerializer,
+from api.serializers import (CookableQuerySerializer, FollowSerializer,
+                             IdListSerializer, IngredientSerializer,
+                             MyUserSerializer, PantryEditSerializer,
+                             PantryItemSerializer, RecipeBatchQuerySerializer,
+                             RecipeCreateSerializer, RecipeDocumentSerializer,
                              RecipeReadSerializer, RecipeShortSerializer,
-                             TagsSerializer)
-from api.utils import download_cart
-from recipes.models import Favourite, Ingredient, Recipe, ShoppingCart, Tag
-from users.models import Follow, User
+                             ShoppingListSerializer, SimilarQuerySerializer,
+                             TagsSerializer, UserRecipesCountSerializer,
+                             is_field_requested)
+from api.services import (clear_shopping_cart, favorite_toggle, replace_pantry,
+                          replace_shopping_cart, shopping_cart_toggle,
+                          subscription_toggle, update_pantry)
+from api.sse import issue_ticket
+from api.throttling import ActionRateThrottle
+from api.utils import (download_cart, humanize_amount, shopping_list_queryset,
+                       shopping_list_response, subtract_pantry)
+from foodgram.postgresql.pool import get_pool_stats
+from recipes.models import (Ingredient, PantryItem, Recipe, RecipeIngredients,
+                            Tag)
+from users.models import User
+
+RECIPES_COUNT_PARAM = 'recipes_count'
+# Действия, отдающие рецепты из готовых документов (RecipeDocument)
+DOCUMENT_ACTIONS = ('list', 'retrieve')
+
+
+class BulkRelationMixin:
+    """
+    Пакетное добавление и удаление связей пользователя с объектами.
+
+    Методы:
+    - bulk_relation: принимает {"ids": [...]}, возвращает статус
+     для каждого идентификатора
+    """
+
+    def bulk_relation(self, request, toggle, excluded=()):
+        """
+        Добавление (POST) или удаление (DELETE) связей для списка объектов.
+
+        Аргументы:
+        - request: объект запроса
+        - toggle: RelationToggle для нужной связи
+        - excluded: идентификаторы, связь с которыми запрещена
+
+        Возвращает:
+        Ответ со списком {"id": ..., "status": ...} в порядке запроса.
+        """
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results = toggle.add_many(request.user, ids, excluded)
+        else:
+            results = toggle.remove_many(request.user, ids)
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
 
-class MeUserViewSet(UserViewSet):
+class MeUserViewSet(BulkRelationMixin, UserViewSet):
     """
     Представление для работы с пользователями и их подписками.
 
@@ -30,15 +91,66 @@ class MeUserViewSet(UserViewSet):
     - queryset: queryset объектов пользователей
     - serializer_class: класс сериализатора пользователей
     - pagination_class: класс пагинации
+    - filter_backends, search_fields: поиск ?search= по началу username,
+     имени или фамилии
 
     Методы:
+    - get_queryset: метод для получения пользователей с флагом is_subscribed
+     и, по запросу ?recipes_count=true, числом рецептов без отдельных
+     запросов на каждого пользователя
     - subscriptions: метод для получения списка подписок пользователя
     - subscribe: метод для подписки на пользователя или отписки от него
+    - subscribe_bulk: метод для подписки или отписки от нескольких авторов
+
+    Лимиты частоты по действиям: throttle_scopes (ActionRateThrottle).
     """
 
     queryset = User.objects.all()
     serializer_class = MyUserSerializer
-    pagination_class = CustumPagination
+    pagination_class = EstimatedCountPagination
+    throttle_classes = (ActionRateThrottle,)
+    throttle_scopes = {
+        'create': 'signup',
+        'set_password': 'password',
+        'reset_password': 'password',
+        'subscribe': 'toggle',
+        'subscribe_bulk': 'toggle',
+    }
+    filter_backends = (SearchFilter,)
+    search_fields = ('^username', '^first_name', '^last_name')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = subscription_toggle.annotate(
+                queryset, user, 'is_subscribed'
+            )
+        if self.with_recipes_count():
+            # Подзапрос считается только для строк текущей страницы,
+            # в отличие от Count с GROUP BY по всей таблице.
+            queryset = queryset.annotate(recipes_count=Coalesce(
+                Subquery(
+                    Recipe.objects.filter(author=OuterRef('pk'))
+                    .order_by().values('author')
+                    .annotate(count=Count('pk')).values('count')
+                ),
+                0,
+            ))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve') and self.with_recipes_count():
+            return UserRecipesCountSerializer
+        return super().get_serializer_class()
+
+    def with_recipes_count(self):
+        """Запрошено ли поле recipes_count (?recipes_count=true)."""
+        return self.request.query_params.get(
+            RECIPES_COUNT_PARAM, ''
+        ).lower() in ('1', 'true')
 
     @action(
         detail=False, methods=['get'],
@@ -92,35 +204,56 @@ class MeUserViewSet(UserViewSet):
         - Только аутентифицированные могут использовать данный метод.
         """
         user = request.user
-        author = get_object_or_404(User, id=id)
 
         if request.method == 'POST':
+            author = subscription_toggle.get_target(user, id)
             if user.id == author.id:
                 return Response(
                     {'detail': 'Нельзя подписаться на себя'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            if Follow.objects.filter(author=author, user=user).exists():
+            if author.is_related:
                 return Response(
                     {'detail': 'Вы уже подписаны!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Follow.objects.create(user=user, author=author)
+            subscription_toggle.add(user, author)
             serializer = FollowSerializer(author, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            if not Follow.objects.filter(user=user, author=author).exists():
+            if not subscription_toggle.remove(user, id):
                 return Response(
                     {'errors': 'Вы не подписаны'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            subscription = get_object_or_404(Follow, user=user, author=author)
-            subscription.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='subscribe/bulk',
+        permission_classes=[IsAuthenticated])
+    def subscribe_bulk(self, request):
+        """
+        Подписка на нескольких авторов или отписка от них.
+
+        Аргументы:
+        - request: объект запроса с {"ids": [...]}
+
+        Возвращает:
+        Ответ со статусом для каждого автора: added, exists, forbidden
+        (подписка на себя), not_found при подписке и removed, missing,
+        not_found при отписке.
+
+        Права доступа:
+        - Только аутентифицированные могут использовать данный метод.
+        """
+        return self.bulk_relation(request, subscription_toggle,
+                                  excluded={request.user.id})
+
 
 class TagViewSet(
     mixins.ListModelMixin,
@@ -144,6 +277,10 @@ class TagViewSet(
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
+    @cache_response('tags')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class IngredientViewSet(
     mixins.ListModelMixin,
@@ -172,8 +309,12 @@ class IngredientViewSet(
     search_fields = ('name',)
     pagination_class = None
 
+    @cache_response('ingredients')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(BulkRelationMixin, viewsets.ModelViewSet):
     """
     Представление для работы с рецептами.
 
@@ -189,81 +330,219 @@ class RecipeViewSet(viewsets.ModelViewSet):
     - http_method_names: поддерживаемые методы HTTP
 
     Методы:
+    - get_queryset: метод для получения рецептов с подгрузкой только тех
+     связей, которые запрошены параметрами fields и omit, и флагами
+     is_favorited, is_in_shopping_cart и подписки на автора без
+     запросов на каждый рецепт; список и карточка читают готовый
+     документ рецепта вместо тегов, ингредиентов и автора
+    - get_prefetch_lookups: метод для выбора запрошенных связей
+    - prefetch_related_objects: метод для подгрузки запрошенных связей
+    - paginate_queryset: метод для подгрузки связей рецептов страницы,
+     документ которых ещё не собран
     - get_serializer_class: метод для выбора класса сериализатора в зависимости
-     от метода запроса
+     от действия и метода запроса
     - perform_create: метод для выполнения действий при создании рецепта
+     и сборки его документа
     - perform_update: метод для выполнения действий при обновлении рецепта
+     и пересборки его документа
+    - toggle_relation: общий метод добавления и удаления связи с рецептом
     - favorite: метод для добавления или удаления рецепта в избранное
     - shopping_cart: метод для добавления или удаления рецепта в список покупок
+    - favorite_bulk, shopping_cart_bulk: пакетные варианты для списка рецептов
+    - shopping_cart_contents: метод для просмотра, замены и очистки
+     списка покупок целиком
     - download_shopping_cart: метод для скачивания списка покупок
+    - events_ticket: метод для выдачи билета на поток событий о новых
+     рецептах подписок
+    - shopping_list: метод для расчёта списка покупок по набору рецептов
+    - batch: метод для получения нескольких рецептов по списку id
+    - cookable: метод для подбора рецептов по имеющимся ингредиентам
+    - similar: метод для получения похожих рецептов
+
+    Сортировка по популярности: ?ordering=popular|trending (RecipeFilter).
+
+    Лимиты частоты по действиям: throttle_scopes (ActionRateThrottle).
     """
 
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
-    pagination_class = CustumPagination
+    pagination_class = EstimatedCountPagination
+    throttle_classes = (ActionRateThrottle,)
+    throttle_scopes = {
+        'create': 'recipe_write',
+        'update': 'recipe_write',
+        'partial_update': 'recipe_write',
+        'favorite': 'toggle',
+        'shopping_cart': 'toggle',
+        'favorite_bulk': 'toggle',
+        'shopping_cart_bulk': 'toggle',
+        'shopping_cart_contents': {'PUT': 'toggle', 'DELETE': 'toggle'},
+        'download_shopping_cart': 'export',
+        'shopping_list': 'export',
+    }
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    http_method_names = ['get', 'post', 'patch', 'delete']
+    http_method_names = ['get', 'post', 'put', 'patch', 'delete']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        user = self.request.user
+        if self.action in DOCUMENT_ACTIONS:
+            # Теги, ингредиенты и автор уже в документе рецепта.
+            queryset = queryset.select_related('document')
+            if (user.is_authenticated
+                    and is_field_requested(self.request, 'author')):
+                queryset = subscription_toggle.annotate(
+                    queryset, user, 'author_is_subscribed', 'author'
+                )
+        else:
+            queryset = self.prefetch_related_objects(queryset)
+        if user.is_authenticated:
+            if is_field_requested(self.request, 'is_favorited'):
+                queryset = favorite_toggle.annotate(
+                    queryset, user, 'is_favorited'
+                )
+            if is_field_requested(self.request, 'is_in_shopping_cart'):
+                queryset = shopping_cart_toggle.annotate(
+                    queryset, user, 'is_in_shopping_cart'
+                )
+        if not is_field_requested(self.request, 'text'):
+            queryset = queryset.defer('text')
+        return queryset
+
+    def get_prefetch_lookups(self):
+        """Связи, запрошенные параметрами fields и omit."""
+        user = self.request.user
+        lookups = []
+        if is_field_requested(self.request, 'author'):
+            if user.is_authenticated:
+                # Отдельный запрос авторов с флагом подписки вместо
+                # запроса Follow на каждый рецепт.
+                lookups.append(Prefetch(
+                    'author',
+                    queryset=subscription_toggle.annotate(
+                        User.objects.all(), user, 'is_subscribed'
+                    ),
+                ))
+            else:
+                lookups.append('author')
+        if is_field_requested(self.request, 'tags'):
+            lookups.append('tags')
+        if is_field_requested(self.request, 'ingredients'):
+            lookups.append('recipeingredients__ingredient')
+        return lookups
+
+    def prefetch_related_objects(self, queryset):
+        """Подгружает запрошенные связанные объекты для сериализатора."""
+        lookups = self.get_prefetch_lookups()
+        if 'author' in lookups:
+            # Автор без флага подписки подгружается тем же запросом.
+            lookups.remove('author')
+            queryset = queryset.select_related('author')
+        return queryset.prefetch_related(*lookups)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action in DOCUMENT_ACTIONS:
+            # Рецепты, документ которых ещё не собран, сериализуются
+            # обычным образом: их связи подгружаются общими запросами.
+            prefetch_related_objects(
+                [recipe for recipe in page
+                 if not hasattr(recipe, 'document')],
+                *self.get_prefetch_lookups()
+            )
+        return page
 
     def get_serializer_class(self):
+        if self.action in DOCUMENT_ACTIONS:
+            return RecipeDocumentSerializer
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        build_documents_on_commit([serializer.instance.pk])
+
+    def update(self, request, *args, **kwargs):
+        # PUT поддерживается только для списка покупок целиком,
+        # рецепты обновляются через PATCH.
+        if not kwargs.get('partial'):
+            raise MethodNotAllowed(request.method)
+        return super().update(request, *args, **kwargs)
 
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
+        build_documents_on_commit([serializer.instance.pk])
 
-    @action(
-        detail=True,
-        methods=['post',
-                 'delete'], permission_classes=[IsAuthenticated])
-    def favorite(self, request, pk=None):
+    def toggle_relation(self, request, pk, toggle, exists_error,
+                        missing_error):
         """
-        Добавление или удаление рецепта в избранное.
-
-        Метод позволяет добавлять или удалять рецепты в
-        избранное для текущего пользователя.
+        Добавление или удаление связи рецепта с текущим пользователем.
 
         Аргументы:
         - request: объект запроса
         - pk: идентификатор рецепта
+        - toggle: RelationToggle для избранного или списка покупок
+        - exists_error: ошибка при повторном добавлении
+        - missing_error: ошибка при удалении отсутствующей связи
 
         Возвращает:
-        Ответ с данными о рецепте, добавленном или удаленном из избранного.
-
-        Права доступа:
-        - Только аутентифицированные могут использовать данный метод.
+        Ответ с кратким рецептом при добавлении, пустой ответ при удалении.
         """
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
+        user = request.user
 
-        if self.request.method == 'POST':
-            if Favourite.objects.filter(user=user, recipe=recipe).exists():
+        if request.method == 'POST':
+            recipe = toggle.get_target(user, pk)
+            if recipe.is_related:
                 return Response(
-                    {'errors': 'Рецепт уже в избранном'},
+                    {'errors': exists_error},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Favourite.objects.create(user=user, recipe=recipe)
+            toggle.add(user, recipe)
             serializer = RecipeShortSerializer(
                 recipe,
                 context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if self.request.method == 'DELETE':
-            if not Favourite.objects.filter(user=user, recipe=recipe).exists():
+        if request.method == 'DELETE':
+            if not toggle.remove(user, pk):
                 return Response(
-                    {'errors': 'Рецепта нет в избранном'},
+                    {'errors': missing_error},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            favorite = get_object_or_404(Favourite, user=user, recipe=recipe)
-            favorite.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    @action(
+        detail=True,
+        methods=['post',
+                 'delete'], permission_classes=[IsAuthenticated])
+    def favorite(self, request, pk=None):
+        """
+        Добавление или удаление рецепта в избранное.
+
+        Метод позволяет добавлять или удалять рецепты в
+        избранное для текущего пользователя.
+
+        Аргументы:
+        - request: объект запроса
+        - pk: идентификатор рецепта
+
+        Возвращает:
+        Ответ с данными о рецепте, добавленном или удаленном из избранного.
+
+        Права доступа:
+        - Только аутентифицированные могут использовать данный метод.
+        """
+        return self.toggle_relation(
+            request, pk, favorite_toggle,
+            'Рецепт уже в избранном', 'Рецепта нет в избранном'
+        )
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -286,35 +565,163 @@ class RecipeViewSet(viewsets.ModelViewSet):
         Права доступа:
         - Только аутентифицированные могут использовать данный метод.
         """
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
+        return self.toggle_relation(
+            request, pk, shopping_cart_toggle,
+            'Уже в списке', 'Рецепта нет в списке покупок'
+        )
 
-        if self.request.method == 'POST':
-            if user.shopping_cart.filter(recipe=recipe).exists():
-                return Response(
-                    {'errors': 'Уже в списке'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            ShoppingCart.objects.create(user=user, recipe=recipe)
-            serializer = RecipeShortSerializer(
-                recipe,
-                context={'request': request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Получение нескольких рецептов по списку идентификаторов.
 
-        if self.request.method == 'DELETE':
-            if not user.shopping_cart.filter(recipe=recipe).exists():
+        Рецепты читаются одним запросом (со связями по параметрам fields
+        и omit) и возвращаются в порядке запроса.
+
+        Аргументы:
+        - request: объект запроса, параметр ids=1,2,3
+         (не больше BULK_IDS_MAX)
+
+        Возвращает:
+        Ответ {"results": [...], "missing": [...]}, где missing -
+        идентификаторы несуществующих рецептов.
+        """
+        serializer = RecipeBatchQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        recipes = self.get_queryset().in_bulk(ids)
+        data = RecipeReadSerializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        ).data
+        return Response({
+            'results': data,
+            'missing': [pk for pk in ids if pk not in recipes],
+        })
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Похожие рецепты по ингредиентам и тегам.
+
+        Списки соседей предрассчитываются командой build_similar_recipes
+        и хранятся в кэше; при промахе считаются по матрице в памяти.
+
+        Аргументы:
+        - request: объект запроса, параметр limit
+        - pk: идентификатор рецепта
+
+        Возвращает:
+        Ответ со списком рецептов с полем similarity.
+        """
+        serializer = SimilarQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        # Вариант DRF отвечает 404 и на нечисловой pk.
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        neighbours = get_similar_recipes(recipe.pk)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _ in neighbours]
+        )
+        results = []
+        for recipe_id, similarity in neighbours:
+            if len(results) == serializer.validated_data['limit']:
+                break
+            if recipe_id not in recipes:
+                continue
+            data = RecipeShortSerializer(
+                recipes[recipe_id], context={'request': request}
+            ).data
+            data['similarity'] = similarity
+            results.append(data)
+        return Response(results)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/bulk',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_bulk(self, request):
+        """
+        Добавление или удаление нескольких рецептов в избранное.
+
+        Аргументы:
+        - request: объект запроса с {"ids": [...]}
+
+        Возвращает:
+        Ответ со статусом для каждого рецепта.
+
+        Права доступа:
+        - Только аутентифицированные могут использовать данный метод.
+        """
+        return self.bulk_relation(request, favorite_toggle)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/bulk',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request):
+        """
+        Добавление или удаление нескольких рецептов в список покупок.
+
+        Аргументы:
+        - request: объект запроса с {"ids": [...]}
+
+        Возвращает:
+        Ответ со статусом для каждого рецепта.
+
+        Права доступа:
+        - Только аутентифицированные могут использовать данный метод.
+        """
+        return self.bulk_relation(request, shopping_cart_toggle)
+
+    @action(
+        detail=False,
+        methods=['get', 'put', 'delete'],
+        url_path='shopping_cart',
+        url_name='shopping_cart_contents',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_contents(self, request):
+        """
+        Просмотр, замена или очистка списка покупок целиком.
+
+        - GET: текущее содержимое списка покупок
+        - PUT: заменить содержимое рецептами из {"ids": [...]}
+        - DELETE: очистить список покупок
+
+        Аргументы:
+        - request: объект запроса
+
+        Возвращает:
+        Ответ со сводкой списка покупок: count и recipes.
+
+        Права доступа:
+        - Только аутентифицированные могут использовать данный метод.
+        """
+        user = request.user
+        if request.method == 'PUT':
+            serializer = IdListSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            missing = replace_shopping_cart(
+                user, serializer.validated_data['ids']
+            )
+            if missing:
                 return Response(
-                    {'errors': 'Рецепта нет в списке покупок'},
+                    {'errors': 'Рецепты не найдены', 'ids': missing},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            shopping_cart = get_object_or_404(
-                ShoppingCart, user=user,
-                recipe=recipe
-            )
-            shopping_cart.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        elif request.method == 'DELETE':
+            clear_shopping_cart(user)
+        recipes = Recipe.objects.filter(shopping_cart__user=user)
+        serializer = RecipeShortSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response({'count': len(serializer.data),
+                         'recipes': serializer.data})
 
     @action(
         detail=False, methods=['get'],
@@ -337,3 +744,182 @@ class RecipeViewSet(viewsets.ModelViewSet):
         могут использовать данный метод.
         """
         return download_cart(request)
+
+    @action(
+        detail=False, methods=['post'], url_path='events/ticket',
+        permission_classes=[IsAuthenticated]
+    )
+    def events_ticket(self, request):
+        """
+        Выдача билета на подключение к потоку событий.
+
+        Возвращает:
+        Одноразовый билет для GET /api/recipes/events/?ticket=<билет>,
+        действует EVENTS_TICKET_TTL секунд (api/sse.py).
+
+        Права доступа:
+        - Только аутентифицированные пользователи
+        могут использовать данный метод.
+        """
+        return Response({'ticket': issue_ticket(request.user),
+                         'expires_in': settings.EVENTS_TICKET_TTL},
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def cookable(self, request):
+        """
+        Подбор рецептов по имеющимся ингредиентам.
+
+        Рецепты ранжируются по доле своих ингредиентов, которые есть
+        у пользователя, затем по числу таких ингредиентов. Подсчёт идёт
+        по инвертированному индексу в памяти процесса, из БД читаются
+        только найденные рецепты.
+
+        Аргументы:
+        - request: объект запроса, параметры ingredients=1,2,3
+         (по умолчанию запасы пользователя) и limit
+
+        Возвращает:
+        Ответ со списком рецептов с полями covered, total и coverage.
+        """
+        serializer = CookableQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ingredient_ids = serializer.validated_data.get('ingredients')
+        if ingredient_ids is None:
+            if not request.user.is_authenticated:
+                raise ValidationError(
+                    {'ingredients': 'Укажите ингредиенты или войдите, '
+                                    'чтобы использовать запасы'}
+                )
+            ingredient_ids = PantryItem.objects.filter(
+                user=request.user
+            ).values_list('ingredient_id', flat=True)
+        matches = cookable_index.search(
+            list(ingredient_ids), serializer.validated_data['limit']
+        )
+        recipes = Recipe.objects.in_bulk([pk for pk, _, _ in matches])
+        results = []
+        for pk, covered, total in matches:
+            if pk not in recipes:
+                continue
+            data = RecipeShortSerializer(
+                recipes[pk], context={'request': request}
+            ).data
+            data.update(covered=covered, total=total,
+                        coverage=round(covered / total, 4))
+            results.append(data)
+        return Response(results)
+
+    @action(
+        detail=False, methods=['post'],
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_list(self, request):
+        """
+        Список покупок по произвольному набору рецептов.
+
+        Метод не сохраняет данные: принимает
+        {"recipes": [{"id": 1, "servings": 2}, ...]} и возвращает сводный
+        список ингредиентов с учётом числа порций за вычетом запасов
+        пользователя. Несуществующие рецепты в список не попадают.
+
+        Аргументы:
+        - request: объект запроса, параметр file_format=txt|csv
+         возвращает файл вместо JSON
+
+        Возвращает:
+        Ответ со списком ингредиентов или файл списка покупок.
+
+        Права доступа:
+        - Только аутентифицированные пользователи
+        могут использовать данный метод.
+        """
+        serializer = ShoppingListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        servings = serializer.validated_data['recipes']
+        ingredients = subtract_pantry(
+            shopping_list_queryset(
+                RecipeIngredients.objects.filter(recipe_id__in=servings),
+                servings,
+            ),
+            request.user,
+        )
+        file_format = request.query_params.get('file_format')
+        if file_format:
+            return shopping_list_response(ingredients, file_format,
+                                          'shopping_list')
+        results = []
+        for ingredient in ingredients:
+            amount, unit = humanize_amount(ingredient['amount'],
+                                           ingredient['unit'])
+            results.append({'name': ingredient['name'],
+                            'measurement_unit': unit,
+                            'amount': amount})
+        return Response(results)
+
+
+class PantryView(APIView):
+    """
+    Представление для работы с запасами пользователя.
+
+    Запасы вычитаются из списка покупок при его скачивании и расчёте.
+
+    Методы:
+    - get: список запасов
+    - put: заменить запасы целиком на {"items": [{"id", "amount"}]}
+    - patch: изменить перечисленные позиции, amount=0 удаляет позицию
+    - delete: удалить все запасы
+
+    Права доступа:
+    - Только аутентифицированные могут использовать данное представление.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        items = (PantryItem.objects.filter(user=request.user)
+                 .select_related('ingredient'))
+        return Response(PantryItemSerializer(items, many=True).data)
+
+    def put(self, request):
+        return self.edit(request, replace_pantry)
+
+    def patch(self, request):
+        return self.edit(request, update_pantry)
+
+    def delete(self, request):
+        PantryItem.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def edit(self, request, service):
+        serializer = PantryEditSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        service(request.user, serializer.validated_data['items'])
+        return self.get(request)
+
+
+class InstrumentationView(APIView):
+    """
+    Представление со статистикой воркера для мониторинга.
+
+    Статистика собирается в памяти процесса, поэтому ответ относится
+    к воркеру, обработавшему запрос (поле pid).
+
+    Возвращает:
+    - db_pools: статистика пулов соединений с БД (соединения в работе,
+     ожидания, переподключения)
+    - cache: статистика кэша по группам ключей (попадания, промахи,
+     устаревшие и досрочные ответы, ожидания и время пересчётов)
+
+    Права доступа:
+    - Только администраторы.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'db_pools': get_pool_stats(),
+            'cache': get_cache_stats(),
+        })
@@ -0,0 +1,23 @@
+"""
+ASGI config for foodgram project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Read endpoints are served by async views from ``foodgram.asgi_urls``,
+the server-sent events stream by ``api.sse`` outside of Django.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ROOT_URLCONF', 'foodgram.asgi_urls')
+
+django_application = get_asgi_application()
+
+from api.sse import with_recipe_events  # noqa: E402
+
+application = with_recipe_events(django_application)
@@ -0,0 +1,33 @@
+"""foodgram URL Configuration for ASGI
+
+Под ASGI запросы на чтение рецептов, тегов, ингредиентов и подписок
+обслуживаются асинхронными представлениями из 'api.async_views'.
+Адреса совпадают с WSGI-версией, остальные маршруты берутся
+из 'foodgram.urls'.
+"""
+from django.urls import include, path
+
+from api.async_views import async_read_view
+from api.views import (IngredientViewSet, MeUserViewSet, RecipeViewSet,
+                       TagViewSet)
+
+urlpatterns = [
+    path('api/recipes/',
+         async_read_view(RecipeViewSet, {'get': 'list', 'post': 'create'})),
+    path('api/recipes/<int:pk>/',
+         async_read_view(RecipeViewSet, {'get': 'retrieve',
+                                         'patch': 'partial_update',
+                                         'delete': 'destroy'},
+                         detail=True)),
+    path('api/tags/', async_read_view(TagViewSet, {'get': 'list'})),
+    path('api/tags/<int:pk>/',
+         async_read_view(TagViewSet, {'get': 'retrieve'}, detail=True)),
+    path('api/ingredients/',
+         async_read_view(IngredientViewSet, {'get': 'list'})),
+    path('api/ingredients/<int:pk>/',
+         async_read_view(IngredientViewSet, {'get': 'retrieve'},
+                         detail=True)),
+    path('api/users/subscriptions/',
+         async_read_view(MeUserViewSet, {'get': 'subscriptions'})),
+    path('', include('foodgram.urls')),
+]
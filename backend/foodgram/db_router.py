@@ -0,0 +1,115 @@
+"""
+Маршрутизация запросов к БД между основной базой и репликами.
+
+Чтение в безопасных HTTP-запросах (GET, HEAD, OPTIONS) уходит на одну
+из реплик, запись и всё чтение после первой записи в рамках запроса
+остаются на основной базе. После запроса с записью клиент ещё
+DB_REPLICA_STICKY_SECONDS секунд читает с основной базы, чтобы сразу
+видеть свои изменения. Клиент определяется по заголовку Authorization
+или сессионной cookie, метка хранится в общем кэше.
+
+Роутер не видит сам queryset, поэтому select_for_update() в безопасном
+HTTP-запросе ушёл бы на реплику, где блокировка ничего не защищает.
+Блокирующие выборки направляются в основную базу явно:
+Model.objects.using(router.db_for_write(Model)).select_for_update();
+db_for_write заодно переводит остаток запроса на основную базу.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY = 'default'
+
+# Данные, которые читаются только с основной базы: кэш в БД, сессии
+# и токены, только что созданные при входе.
+PRIMARY_ONLY_APPS = {'django_cache', 'sessions', 'authtoken'}
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Состояние маршрутизации текущего запроса."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias != PRIMARY]
+
+
+class ReplicaRouter:
+    """
+    Роутер БД: чтение с реплики, пока в запросе не было записи.
+
+    Вне HTTP-запроса (команды manage.py, фоновые задачи)
+    все запросы идут в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is None
+            or state.replica is None
+            or state.wrote
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+        ):
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит репликацией, а локальные базы-заменители
+        # реплик создаются через migrate --database replica_N.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Выбирает реплику для безопасных запросов и закрепляет клиента
+    за основной базой после записи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky_key = self.get_sticky_key(request)
+        replicas = get_replicas()
+        replica = None
+        if (
+            replicas
+            and request.method in SAFE_METHODS
+            and not (sticky_key and cache.get(sticky_key))
+        ):
+            replica = random.choice(replicas)
+        state = RoutingState(replica)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if sticky_key and (state.wrote or request.method not in SAFE_METHODS):
+            cache.set(sticky_key, True, settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    def get_sticky_key(self, request):
+        identity = (request.META.get('HTTP_AUTHORIZATION')
+                    or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        if not identity:
+            return None
+        digest = hashlib.sha256(identity.encode()).hexdigest()
+        return f'db-sticky:{digest}'
@@ -0,0 +1,71 @@
+"""
+Бэкенд PostgreSQL с проверкой соединений и необязательным пулом.
+
+Настройки подключения (ключ 'POOL' в DATABASES):
+- ENABLED: брать соединения из локального пула процесса
+- MAX_SIZE, TIMEOUT, PRE_PING, MAX_LIFETIME: параметры пула
+- HEALTH_CHECKS: проверять постоянное соединение (CONN_MAX_AGE)
+  один раз за запрос, при первом обращении к БД; новое соединение
+  не проверяется
+"""
+from django.db.backends.postgresql import base
+
+from foodgram.postgresql.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    health_check_done = False
+
+    @property
+    def pool_options(self):
+        return self.settings_dict.get('POOL') or {}
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_options.get('ENABLED'):
+            return super().get_new_connection(conn_params)
+        pool = get_pool(
+            self.alias,
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params),
+            self.pool_options,
+        )
+        connection = pool.getconn()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None or not self.pool_options.get('ENABLED'):
+            return super()._close()
+        with self.wrap_database_errors:
+            get_pool(self.alias, None, self.pool_options).putconn(
+                self.connection)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def close_if_health_check_failed(self):
+        """Закрывает соединение, если оно не отвечает на проверку."""
+        if (
+            self.connection is None
+            or not self.pool_options.get('HEALTH_CHECKS')
+            or self.health_check_done
+            or self.in_atomic_block
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается на request_started и request_finished: соединение
+        # проверяется не здесь, а при первом запросе к БД в следующем
+        # цикле.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
@@ -0,0 +1,183 @@
+"""
+Локальный пул соединений psycopg2 для одного процесса воркера.
+
+Пул ограничивает число соединений процесса (MAX_SIZE), при исчерпании
+ждёт освобождения соединения не дольше TIMEOUT секунд, а перед выдачей
+проверяет соединение запросом 'SELECT 1' (PRE_PING) и при необходимости
+переподключается. Статистика пулов доступна через 'get_pool_stats'.
+"""
+import threading
+import time
+from collections import deque
+
+from psycopg2 import OperationalError, extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """Не удалось получить соединение из пула за отведённое время."""
+
+
+class ConnectionPool:
+    """
+    Пул соединений с ограничением размера и проверкой перед выдачей.
+
+    connect - функция, открывающая новое физическое соединение.
+    max_size - максимальное число открытых соединений процесса.
+    timeout - время ожидания свободного соединения в секундах.
+    pre_ping - проверять соединение перед выдачей.
+    max_lifetime - время жизни соединения в секундах, 0 - без ограничения.
+    """
+
+    def __init__(self, connect, max_size, timeout, pre_ping, max_lifetime):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.max_lifetime = max_lifetime
+        self._idle = deque()
+        self._opened_at = {}
+        self._size = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self.created = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.reconnections = 0
+
+    def getconn(self):
+        """Выдаёт соединение из пула или открывает новое."""
+        connection = self._checkout()
+        if connection is None:
+            connection = self._open()
+        elif self._expired(connection) or not self._is_alive(connection):
+            self._discard(connection)
+            connection = self._open()
+            with self._condition:
+                self.reconnections += 1
+        return connection
+
+    def putconn(self, connection):
+        """Возвращает соединение в пул или закрывает неисправное."""
+        if not connection.closed:
+            try:
+                status = connection.info.transaction_status
+                if status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except OperationalError:
+                pass
+        with self._condition:
+            self._in_use -= 1
+            if connection.closed:
+                self._forget(connection)
+            else:
+                self._idle.append(connection)
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self.created,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'reconnections': self.reconnections,
+            }
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            waited = False
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f'Нет свободных соединений в пуле '
+                            f'({self.max_size}) за {self.timeout} с'
+                        )
+            self.checkouts += 1
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.created += 1
+            self._opened_at[id(connection)] = time.monotonic()
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except OperationalError:
+            pass
+        with self._condition:
+            self._opened_at.pop(id(connection), None)
+
+    def _forget(self, connection):
+        self._size -= 1
+        self._opened_at.pop(id(connection), None)
+
+    def _expired(self, connection):
+        if not self.max_lifetime:
+            return False
+        opened_at = self._opened_at.get(id(connection), time.monotonic())
+        return time.monotonic() - opened_at > self.max_lifetime
+
+    def _is_alive(self, connection):
+        if connection.closed:
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except OperationalError:
+            return False
+        return True
+
+
+def get_pool(alias, connect, options):
+    """Возвращает пул процесса для подключения alias, создавая его."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                connect,
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 10),
+                pre_ping=options.get('PRE_PING', True),
+                max_lifetime=options.get('MAX_LIFETIME', 0),
+            )
+        return pool
+
+
+def get_pool_stats():
+    """Статистика всех пулов процесса по псевдонимам подключений."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
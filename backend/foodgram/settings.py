@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'api',
     'users',
     'recipes',
+    'jobs',
 ]
 
 REST_FRAMEWORK = {
@@ -46,17 +47,113 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 
+    # Лимиты действий API (api.throttling.ActionRateThrottle)
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe_write': os.getenv('THROTTLE_RECIPE_WRITE', '60/hour'),
+        'toggle': os.getenv('THROTTLE_TOGGLE', '120/min'),
+        'export': os.getenv('THROTTLE_EXPORT', '30/hour'),
+        'signup': os.getenv('THROTTLE_SIGNUP', '20/hour'),
+        'password': os.getenv('THROTTLE_PASSWORD', '10/hour'),
+    },
 }
 
+# Кэш аутентификации по токену: общий кэш и локальный LRU процесса
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 300))
+AUTH_TOKEN_LOCAL_CACHE_TTL = int(os.getenv('AUTH_TOKEN_LOCAL_CACHE_TTL', 10))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(
+    os.getenv('AUTH_TOKEN_LOCAL_CACHE_SIZE', 10000))
+
+# Максимальное число идентификаторов в пакетных запросах
+BULK_IDS_MAX = int(os.getenv('BULK_IDS_MAX', 100))
+
+# Начиная с этого числа строк списки без фильтров показывают оценку
+# количества из статистики Postgres вместо SELECT COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = int(
+    os.getenv('ESTIMATED_COUNT_THRESHOLD', 100000))
+# Время жизни кэша точного количества для отфильтрованных списков API
+COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 30))
+
+# Сжатие ответов: минимальный размер тела в байтах и уровни сжатия
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+# Время жизни кэша готовых ответов со списками тегов и ингредиентов
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 600))
+
+# Защита от одновременного пересчёта ключей кэша (api/cache.py): сколько
+# секунд отдавать устаревшее значение во время пересчёта, коэффициент
+# досрочного обновления, время жизни блокировки и ожидания чужого пересчёта
+CACHE_STALE_TTL = int(os.getenv('CACHE_STALE_TTL', 60))
+CACHE_EARLY_BETA = float(os.getenv('CACHE_EARLY_BETA', 1.0))
+CACHE_LOCK_TIMEOUT = int(os.getenv('CACHE_LOCK_TIMEOUT', 30))
+CACHE_LOCK_WAIT = float(os.getenv('CACHE_LOCK_WAIT', 5))
+
+# Индексы рецептов в памяти процесса: журнал изменений в кэше
+# и период полной перестройки в секундах
+RECIPE_INDEX_CHANGELOG_TTL = int(
+    os.getenv('RECIPE_INDEX_CHANGELOG_TTL', 3600))
+RECIPE_INDEX_CHANGELOG_SIZE = int(
+    os.getenv('RECIPE_INDEX_CHANGELOG_SIZE', 1000))
+RECIPE_INDEX_MAX_AGE = int(os.getenv('RECIPE_INDEX_MAX_AGE', 3600))
+COOKABLE_MAX_LIMIT = int(os.getenv('COOKABLE_MAX_LIMIT', 100))
+
+# Похожие рецепты: снимок матрицы команды build_similar_recipes,
+# число соседей и время жизни их кэша
+SIMILAR_RECIPES_SNAPSHOT = os.getenv(
+    'SIMILAR_RECIPES_SNAPSHOT',
+    os.path.join(BASE_DIR, 'indexes', 'similar_recipes.npz'))
+SIMILAR_RECIPES_LIMIT = int(os.getenv('SIMILAR_RECIPES_LIMIT', 20))
+SIMILAR_RECIPES_CACHE_TTL = int(
+    os.getenv('SIMILAR_RECIPES_CACHE_TTL', 24 * 60 * 60))
+
+# Популярность рецептов (команда aggregate_recipe_scores): веса событий,
+# окна и периоды полураспада оценок popular (дни) и trending (часы)
+RECIPE_SCORE_WEIGHTS = {'favorite': 1.0, 'shopping_cart': 0.5}
+RECIPE_SCORE_WINDOW_DAYS = int(os.getenv('RECIPE_SCORE_WINDOW_DAYS', 180))
+RECIPE_SCORE_POPULAR_HALF_LIFE = float(
+    os.getenv('RECIPE_SCORE_POPULAR_HALF_LIFE', 30))
+RECIPE_SCORE_TRENDING_WINDOW_HOURS = int(
+    os.getenv('RECIPE_SCORE_TRENDING_WINDOW_HOURS', 7 * 24))
+RECIPE_SCORE_TRENDING_HALF_LIFE = float(
+    os.getenv('RECIPE_SCORE_TRENDING_HALF_LIFE', 24))
+
+# Фоновые задачи (manage.py run_worker): попытки, задержка повтора
+# в секундах, таймаут зависшей задачи; JOBS_EAGER выполняет задачи
+# в процессе запроса без воркера
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 5))
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+JOBS_RETRY_MAX_DELAY = int(os.getenv('JOBS_RETRY_MAX_DELAY', 3600))
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', 600))
+JOBS_WORKER_THREADS = int(os.getenv('JOBS_WORKER_THREADS', 4))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+
+# Поток событий о новых рецептах подписок (api/events.py, api/sse.py):
+# бэкенд доставки, журнал событий в кэше и период его опроса, длина
+# очереди соединения, интервалы keepalive и закрытия простаивающего
+# соединения в секундах, задержка переподключения клиента в миллисекундах,
+# время жизни одноразового билета на подключение в секундах
+EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'api.events.CacheBackend')
+EVENTS_LOG_TTL = int(os.getenv('EVENTS_LOG_TTL', 300))
+EVENTS_LOG_SIZE = int(os.getenv('EVENTS_LOG_SIZE', 1000))
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', 1))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+EVENTS_KEEPALIVE = float(os.getenv('EVENTS_KEEPALIVE', 15))
+EVENTS_IDLE_TIMEOUT = float(os.getenv('EVENTS_IDLE_TIMEOUT', 600))
+EVENTS_RETRY = int(os.getenv('EVENTS_RETRY', 3000))
+EVENTS_TICKET_TTL = int(os.getenv('EVENTS_TICKET_TTL', 30))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'foodgram.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -65,7 +162,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'foodgram.urls')
 
 TEMPLATES = [
     {
@@ -85,16 +182,62 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+DB_POOL_ENABLED = os.getenv('DB_POOL_ENABLED', 'False') == 'True'
+
 DATABASES = {
     'default': {
-        # Меняем настройку Django: теперь для работы будет использоваться
-        # бэкенд postgresql
-        'ENGINE': 'django.db.backends.postgresql',
+        # Бэкенд postgresql с проверкой соединений и необязательным пулом
+        'ENGINE': 'foodgram.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'postgres'),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # С пулом соединение возвращается в пул после каждого запроса,
+        # без пула соединение живёт DB_CONN_MAX_AGE секунд
+        'CONN_MAX_AGE': (0 if DB_POOL_ENABLED
+                         else int(os.getenv('DB_CONN_MAX_AGE', 60))),
+        'POOL': {
+            'ENABLED': DB_POOL_ENABLED,
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'PRE_PING': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',
+            'MAX_LIFETIME': int(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+            'HEALTH_CHECKS': os.getenv('DB_HEALTH_CHECKS', 'True') == 'True',
+        },
+    }
+}
+
+# Реплики для чтения: DB_REPLICAS=host[:port][/name],host2...
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    address, _, name = replica.strip().partition('/')
+    host, _, port = address.partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+# Общий кэш воркеров, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache.
+# Сброс кэша ответов, метки чтения с основной базы, лимиты частоты и
+# журналы индексов и событий работают только с общим кэшем, LocMemCache
+# годится лишь для разработки (проверка api.W001 при DEBUG=False)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -129,6 +272,17 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'collect_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Статический снимок каталога (manage.py export_catalogue): каталог в томе,
+# который раздаёт nginx, его URL, наибольшее сочетание тегов со своим списком
+# и запись .br рядом с .gz (только если в nginx есть brotli_static);
+# CATALOGUE_SITE_URL - адрес сайта для абсолютных ссылок на картинки
+CATALOGUE_ROOT = os.getenv('CATALOGUE_ROOT',
+                           os.path.join(BASE_DIR, 'catalogue'))
+CATALOGUE_URL = os.getenv('CATALOGUE_URL', '/catalogue/')
+CATALOGUE_MAX_TAGS = int(os.getenv('CATALOGUE_MAX_TAGS', 2))
+CATALOGUE_BROTLI = os.getenv('CATALOGUE_BROTLI', 'False') == 'True'
+CATALOGUE_SITE_URL = os.getenv('CATALOGUE_SITE_URL', '')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
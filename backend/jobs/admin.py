@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    '''Админка фоновых задач.'''
+
+    list_display = ('pk', 'name', 'status', 'attempts', 'run_at',
+                    'locked_by')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created', 'locked_at', 'locked_by', 'last_error')
+    actions = ('retry',)
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        queryset.update(status=Job.QUEUED, attempts=0,
+                        run_at=timezone.now())
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    """
+    Конфигурация приложения фоновых задач.
+    """
+    default_auto_field = "django.db.models.BigAutoField"
+    name = 'jobs'
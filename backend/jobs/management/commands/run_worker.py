@@ -0,0 +1,50 @@
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.queue import claim, requeue_stale, run
+
+
+class Command(BaseCommand):
+    help = 'run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', default=settings.JOBS_WORKER_THREADS,
+                            type=int)
+        parser.add_argument('--poll-interval',
+                            default=settings.JOBS_POLL_INTERVAL, type=float,
+                            help='seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError('threads должен быть больше 0')
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.set())
+        self.stdout.write(f'worker {worker}, {options["threads"]} threads')
+        running = set()
+        with ThreadPoolExecutor(options['threads']) as executor:
+            while not stopping.is_set():
+                requeue_stale()
+                if len(running) < options['threads']:
+                    jobs = claim(worker, options['threads'] - len(running))
+                    running.update(executor.submit(run, job)
+                                   for job in jobs)
+                if running:
+                    # Ждём освобождения потока, но не дольше интервала
+                    # опроса, чтобы подхватывать новые задачи.
+                    _, running = wait(running, options['poll_interval'],
+                                      return_when=FIRST_COMPLETED)
+                elif options['once']:
+                    break
+                else:
+                    stopping.wait(options['poll_interval'])
+            self.stdout.write(f'stopping, waiting for {len(running)} jobs')
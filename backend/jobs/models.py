@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    '''Модель фоновой задачи в очереди.'''
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(verbose_name='Задача', max_length=200)
+    args = models.JSONField(verbose_name='Аргументы', default=list)
+    kwargs = models.JSONField(verbose_name='Именованные аргументы',
+                              default=dict)
+    status = models.CharField(verbose_name='Статус', max_length=16,
+                              choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(verbose_name='Попыток',
+                                                default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток')
+    run_at = models.DateTimeField(verbose_name='Запустить после',
+                                  default=timezone.now)
+    locked_at = models.DateTimeField(verbose_name='Взята в работу',
+                                     null=True, blank=True)
+    locked_by = models.CharField(verbose_name='Воркер', max_length=100,
+                                 blank=True)
+    last_error = models.TextField(verbose_name='Последняя ошибка',
+                                  blank=True)
+    created = models.DateTimeField(verbose_name='Создана',
+                                   auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('run_at',)
+        indexes = (
+            models.Index(fields=('status', 'run_at'),
+                         name='job_status_run_at'),
+        )
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
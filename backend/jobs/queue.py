@@ -0,0 +1,132 @@
+"""
+Очередь фоновых задач в БД.
+
+Задача - функция, помеченная декоратором task. Вызов func.delay(...)
+ставит её в очередь после фиксации текущей транзакции, поэтому задача
+не увидит незафиксированных данных и не запустится при откате.
+Модуль с задачами должен импортироваться при запуске Django (например,
+из AppConfig.ready), иначе воркер не найдёт задачу по имени.
+
+Воркер (manage.py run_worker) забирает задачи пачками через
+SELECT ... FOR UPDATE SKIP LOCKED: несколько воркеров не блокируют друг
+друга и не получают одну задачу дважды. Успешные задачи удаляются из
+таблицы, упавшие повторяются с экспоненциальной задержкой, после
+max_attempts попыток остаются со статусом failed для разбора в админке.
+Задачи, зависшие у упавшего воркера, возвращаются в очередь по таймауту.
+
+При JOBS_EAGER задачи выполняются сразу после фиксации транзакции
+в процессе запроса - для разработки без воркера.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(func=None, *, max_attempts=None):
+    """
+    Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи должны сериализоваться в JSON. Функции добавляется
+    метод delay(*args, **kwargs), который ставит задачу в очередь.
+
+    Args:
+        func: Функция задачи.
+        max_attempts: Число попыток, по умолчанию JOBS_MAX_ATTEMPTS.
+    """
+    def register(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        _registry[name] = func
+        func.task_name = name
+        func.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        func.delay = lambda *args, **kwargs: enqueue(func, *args, **kwargs)
+        return func
+
+    return register(func) if func is not None else register
+
+
+def enqueue(func, *args, **kwargs):
+    """Ставит задачу в очередь после фиксации текущей транзакции."""
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+    transaction.on_commit(lambda: Job.objects.create(
+        name=func.task_name, args=list(args), kwargs=kwargs,
+        max_attempts=func.max_attempts,
+    ))
+
+
+def claim(worker, limit):
+    """
+    Забирает до limit готовых к запуску задач.
+
+    Строки блокируются с SKIP LOCKED только на время короткой
+    транзакции, в которой задачи помечаются как выполняемые.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.using(router.db_for_write(Job))
+            .select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('run_at')[:limit]
+        )
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=Job.RUNNING, locked_at=now, locked_by=worker,
+            attempts=F('attempts') + 1,
+        )
+    for job in jobs:
+        job.attempts += 1
+    return jobs
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, зависшие дольше JOBS_LOCK_TIMEOUT."""
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOBS_LOCK_TIMEOUT),
+    ).update(status=Job.QUEUED, locked_at=None, locked_by='')
+
+
+def retry_delay(attempt):
+    """Задержка перед повтором: экспонента от JOBS_RETRY_DELAY с джиттером."""
+    delay = min(settings.JOBS_RETRY_DELAY * 2 ** (attempt - 1),
+                settings.JOBS_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1)
+
+
+def run(job):
+    """Выполняет задачу и фиксирует результат в очереди."""
+    close_old_connections()
+    try:
+        func = _registry.get(job.name)
+        if func is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована')
+        func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('Задача %s #%s упала', job.name, job.pk)
+        failed = job.attempts >= job.max_attempts
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED if failed else Job.QUEUED,
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)),
+            locked_at=None,
+            locked_by='',
+            last_error=traceback.format_exc()[-4000:],
+        )
+    else:
+        Job.objects.filter(pk=job.pk).delete()
+    finally:
+        close_old_connections()
@@ -1,7 +1,12 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredients,
-                            ShoppingCart, Tag)
+from api.documents import build_documents_on_commit
+from api.pagination import EstimatedCountPaginator
+from recipes.models import (Favourite, Ingredient, PantryItem, Recipe,
+                            RecipeDocument, RecipeEvent, RecipeIngredients,
+                            RecipeScore, ShoppingCart, Tag)
 
 
 @admin.register(Tag)
@@ -16,30 +21,55 @@ class RecipeIngredientsInLine(admin.TabularInline):
     model = Recipe.ingredients.through
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    '''Админка ингредеентов'''
-
-    list_display = ('pk', 'name', 'author', 'text',
-                    'cooking_time', 'image', 'date')
-    search_fields = ('name', 'author', 'text', 'cooking_time')
-    list_filter = ('name', 'author', 'tags')
-    readonly_fields = ('favarite_count',)
+    '''Админка рецептов.
+
+    Поиск по началу названия (индекс name) и имени автора, фильтр
+    по дате публикации, число избранных - подзапросом только для
+    строк текущей страницы.
+    '''
+
+    list_display = ('pk', 'name', 'author', 'cooking_time', 'date',
+                    'favorite_count')
+    list_select_related = ('author',)
+    search_fields = ('name__startswith', '^author__username')
+    list_filter = (('date', admin.DateFieldListFilter), 'tags')
+    autocomplete_fields = ('author',)
+    readonly_fields = ('favorite_count',)
     inlines = (RecipeIngredientsInLine,)
-
-    def favarite_count(self, obj):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorite_count=Coalesce(Subquery(
+                Favourite.objects.filter(recipe=OuterRef('pk'))
+                .order_by().values('recipe')
+                .annotate(count=Count('pk')).values('count')
+            ), 0)
+        )
+
+    @admin.display(description='В избранном')
+    def favorite_count(self, obj):
         '''Количество избранных.'''
-        return obj.favorites.count()
+        return obj.favorite_count
+
+    def save_related(self, request, form, formsets, change):
+        '''Пересобирает документ рецепта после сохранения ингредиентов.'''
+        super().save_related(request, form, formsets, change)
+        build_documents_on_commit([form.instance.pk])
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     '''Админка иингредентов.'''
     list_display = ('pk', 'name', 'measurement_unit')
-    search_fields = ('name', 'measurement_unit')
-    list_filter = ('name', 'measurement_unit')
+    search_fields = ('^name',)
+    list_filter = ('measurement_unit',)
 
 
 @admin.register(RecipeIngredients)
@@ -47,8 +77,27 @@ class RecipeIngridientsAdmin(admin.ModelAdmin):
     '''Админка ингредентов в рецептах.'''
 
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
-    search_fields = ('recipe', 'ingredient')
-    list_filter = ('recipe', 'ingredient')
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name__startswith', '^ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        '''Пересобирает документ рецепта после сохранения ингредиента.'''
+        super().save_model(request, obj, form, change)
+        build_documents_on_commit([obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        '''Пересобирает документ рецепта после удаления ингредиента.'''
+        super().delete_model(request, obj)
+        build_documents_on_commit([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        '''Пересобирает документы рецептов удалённых ингредиентов.'''
+        pks = list(queryset.values_list('recipe_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        build_documents_on_commit(pks)
 
 
 @admin.register(ShoppingCart)
@@ -56,7 +105,11 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     '''Админка покупок.'''
 
     list_display = ('user', 'recipe',)
-    search_fields = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', 'recipe__name__startswith')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Favourite)
@@ -64,4 +117,53 @@ class FavouriteAdmin(admin.ModelAdmin):
     '''Админка избранноого'''
 
     list_display = ('user', 'recipe',)
-    search_fields = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', 'recipe__name__startswith')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(PantryItem)
+class PantryItemAdmin(admin.ModelAdmin):
+    '''Админка запасов.'''
+
+    list_display = ('user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
+    search_fields = ('^user__username', '^ingredient__name')
+    autocomplete_fields = ('user', 'ingredient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(RecipeEvent)
+class RecipeEventAdmin(admin.ModelAdmin):
+    '''Админка событий рецептов.'''
+
+    list_display = ('created', 'kind', 'delta', 'user', 'recipe')
+    list_filter = ('kind', ('created', admin.DateFieldListFilter))
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(RecipeScore)
+class RecipeScoreAdmin(admin.ModelAdmin):
+    '''Админка популярности рецептов.'''
+
+    list_display = ('recipe', 'popular', 'trending', 'updated')
+    list_select_related = ('recipe',)
+    ordering = ('-popular',)
+
+
+@admin.register(RecipeDocument)
+class RecipeDocumentAdmin(admin.ModelAdmin):
+    '''Админка документов рецептов.'''
+
+    list_display = ('recipe', 'updated')
+    list_select_related = ('recipe',)
+    autocomplete_fields = ('recipe',)
+    readonly_fields = ('data', 'updated')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -52,7 +53,8 @@ class Recipe(models.Model):
                                on_delete=models.CASCADE,
                                related_name='recipes',)
     name = models.CharField(verbose_name='Название',
-                            max_length=200)
+                            max_length=200,
+                            db_index=True)
     image = models.ImageField(verbose_name='Картинка',
                               upload_to='recipes/')
     text = models.TextField(verbose_name='Текст')
@@ -71,7 +73,8 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1, message='Минимальное значение 1!')])
     date = models.DateTimeField(verbose_name='Дата публикации',
                                 validators=(validate_year,),
-                                auto_now_add=True)
+                                auto_now_add=True,
+                                db_index=True)
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -150,3 +153,113 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'Добавил в корзину {self.recipe}'
+
+
+class PantryItem(models.Model):
+    '''Модель запасов пользователя.'''
+
+    user = models.ForeignKey(User,
+                             verbose_name='Пользователь',
+                             on_delete=models.CASCADE,
+                             related_name='pantry')
+    ingredient = models.ForeignKey(Ingredient,
+                                   verbose_name='Ингридиент',
+                                   on_delete=models.CASCADE,
+                                   related_name='pantry')
+    amount = models.PositiveIntegerField(
+        verbose_name='Колличество', validators=(MinValueValidator(1),))
+
+    class Meta:
+        verbose_name = 'Запас'
+        verbose_name_plural = 'Запасы'
+        ordering = ('ingredient__name',)
+        constraints = (
+            UniqueConstraint(fields=('user', 'ingredient'),
+                             name='unique_pantry_item'),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} у {self.user}-{self.amount}'
+
+
+class RecipeEvent(models.Model):
+    '''Модель события добавления или удаления рецепта пользователем.'''
+
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    KINDS = (
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+    )
+
+    user = models.ForeignKey(User,
+                             verbose_name='Пользователь',
+                             on_delete=models.SET_NULL,
+                             null=True,
+                             related_name='recipe_events')
+    recipe = models.ForeignKey(Recipe,
+                               verbose_name='Рецепт',
+                               on_delete=models.CASCADE,
+                               related_name='events')
+    kind = models.CharField(verbose_name='Тип', max_length=16,
+                            choices=KINDS)
+    delta = models.SmallIntegerField(
+        verbose_name='Изменение', help_text='1 - добавление, -1 - удаление')
+    created = models.DateTimeField(verbose_name='Время', auto_now_add=True,
+                                   db_index=True)
+
+    class Meta:
+        verbose_name = 'Событие рецепта'
+        verbose_name_plural = 'События рецептов'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.delta:+} {self.recipe}'
+
+
+class RecipeScore(models.Model):
+    '''Модель рассчитанной популярности рецепта.'''
+
+    recipe = models.OneToOneField(Recipe,
+                                  verbose_name='Рецепт',
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='score')
+    popular = models.FloatField(verbose_name='Популярность', default=0)
+    trending = models.FloatField(verbose_name='Тренд', default=0)
+    updated = models.DateTimeField(verbose_name='Рассчитано', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        # Порядок совпадает с сортировкой RecipeFilter.filter_ordering:
+        # страница читается по индексу без сортировки всех рецептов.
+        indexes = (
+            models.Index(fields=('-popular', '-recipe'),
+                         name='recipe_score_popular'),
+            models.Index(fields=('-trending', '-recipe'),
+                         name='recipe_score_trending'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular:.2f}/{self.trending:.2f}'
+
+
+class RecipeDocument(models.Model):
+    '''Модель готового публичного JSON-представления рецепта.'''
+
+    recipe = models.OneToOneField(Recipe,
+                                  verbose_name='Рецепт',
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='document')
+    data = models.JSONField(verbose_name='Документ',
+                            encoder=DjangoJSONEncoder)
+    updated = models.DateTimeField(verbose_name='Собран', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Документ рецепта'
+        verbose_name_plural = 'Документы рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}'
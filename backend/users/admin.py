@@ -1,18 +1,28 @@
 from django.contrib import admin
 
+from api.pagination import EstimatedCountPaginator
 from users.models import Follow, User
 
 
 @admin.register(User)
 class UsersAdmin(admin.ModelAdmin):
-    """Пользователь."""
+    """
+    Пользователь.
+
+    Поиск по началу username, почты, имени и фамилии использует
+    префиксные индексы из миграций users.
+    """
 
     list_display = ('username', 'email', 'first_name',
-                    'last_name', 'password',)
+                    'last_name', 'is_staff', 'date_joined')
+
+    search_fields = ('^username', '^email', '^first_name', '^last_name')
 
-    search_fields = ('username', 'email',)
+    list_filter = ('is_staff', 'is_active',
+                   ('date_joined', admin.DateFieldListFilter))
 
-    list_filter = ('username', 'email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Follow)
@@ -20,4 +30,8 @@ class FolowAdmin(admin.ModelAdmin):
     """Подписчик."""
 
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Поиск по префиксу (istartswith) в Postgres строится как
+# UPPER(col::text) LIKE UPPER('...%'); такой запрос использует только
+# функциональный индекс с text_pattern_ops, который нельзя описать
+# в Meta.indexes.
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS users_user_{field}_prefix '
+            f'ON users_user (UPPER({field}::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS users_user_{field}_prefix'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]